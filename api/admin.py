@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StockPrediction, TelegramUser, UserProfile
+from .models import StockPrediction, TelegramUser, UserProfile, TelegramFile
 
 # Register your models here.
 
@@ -22,4 +22,10 @@ class TelegramUserAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'is_pro', 'daily_request_count', 'last_request_date')
     search_fields = ('user__username',)
-    readonly_fields = ('user',)
\ No newline at end of file
+    readonly_fields = ('user',)
+
+@admin.register(TelegramFile)
+class TelegramFileAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'file_id', 'created_at')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at',)
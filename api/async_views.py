@@ -0,0 +1,211 @@
+"""
+Async versions of the predict and list endpoints, for running under an ASGI
+server (see stock_insight/asgi.py). Waiting on the database and on queued
+prediction jobs doesn't hold a worker thread, so one process can serve many
+slow clients at once. They accept JWT bearer tokens only.
+
+/async/predict/stream/ reports a job's stages as Server-Sent Events while
+it runs. Under WSGI the stream is buffered and only sent once it ends.
+"""
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from decouple import config
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.fields import BooleanField
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .models import PredictionJob, StockPrediction, UserProfile
+from .pagination import PredictionCursorPagination
+from .quota import consume_quota
+from .serializers import PredictionJobSerializer, StockPredictionSerializer
+from ml_model.tickers import clean_ticker
+from stock_insight.metrics import timer
+
+# Longest a client may ask /async/predict/ to wait for its job to finish
+ASYNC_PREDICT_MAX_WAIT = config('ASYNC_PREDICT_MAX_WAIT', default=30, cast=float)
+# Longest /async/predict/stream/ stays open; clients can poll the job's status_url after that
+ASYNC_PREDICT_STREAM_TIMEOUT = config('ASYNC_PREDICT_STREAM_TIMEOUT', default=300, cast=float)
+JOB_POLL_INTERVAL = 0.25
+# Comment lines sent on an idle stream so proxies don't drop it
+SSE_KEEPALIVE_INTERVAL = 15
+
+
+async def authenticate(request):
+    """Return the user of the request's JWT, or None."""
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
+
+def unauthorized():
+    return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+
+async def wait_for_job(job_id, timeout):
+    """Poll a job until it finishes or `timeout` seconds pass and return it."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await PredictionJob.objects.aget(id=job_id)
+        if job.status in (PredictionJob.SUCCEEDED, PredictionJob.FAILED) or loop.time() >= deadline:
+            return job
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def job_body(job):
+    body = PredictionJobSerializer(job).data
+    body['status_url'] = reverse('prediction_job_detail', args=[job.id])
+    return body
+
+
+async def queue_job(request):
+    """
+    Authenticate, validate and count a predict request and queue its job.
+
+    Returns `(job, request data)` with `wait` clamped, or `(None, error response)`.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return None, unauthorized()
+
+    try:
+        data = json.loads(request.body or b'{}')
+        wait = float(data.get('wait', 0))
+        # NaN passes min() and max() unchanged and would never reach the deadline
+        if not math.isfinite(wait):
+            raise ValueError('wait must be a finite number of seconds')
+        data['wait'] = min(max(wait, 0.0), ASYNC_PREDICT_MAX_WAIT)
+        plots = data.get('plots', True) not in BooleanField.FALSE_VALUES
+    except (ValueError, TypeError, AttributeError):
+        return None, JsonResponse({'error': 'Invalid request body'}, status=400)
+
+    if not data.get('ticker'):
+        return None, JsonResponse({'error': 'A ticker is required'}, status=400)
+    # Before the quota, so a malformed symbol isn't charged or queued
+    ticker = clean_ticker(data.get('ticker'))
+    if ticker is None:
+        return None, JsonResponse({'error': 'Invalid ticker symbol'}, status=400)
+
+    # Count this request, unless today's quota is used up
+    if not await sync_to_async(consume_quota)(UserProfile, user=user):
+        return None, JsonResponse({'error': 'Quota exceeded. Upgrade to Pro.'}, status=429)
+
+    with timer('db_insert'):
+        job = await PredictionJob.objects.acreate(user=user, ticker=ticker, plots=plots)
+    return job, data
+
+
+async def job_events(job, timeout):
+    """
+    Stream a job as Server-Sent Events: "queued" right away, then each stage
+    the worker reports ("fetched", "inference", "plots", "saved"), then
+    "done" with the finished job or "error". Ends with "timeout" if the job
+    is still unfinished after `timeout` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    last_sent = loop.time()
+    yield sse('queued', job_body(job))
+
+    sent = 0
+    while True:
+        job = await PredictionJob.objects.aget(id=job.id)
+        if len(job.progress) < sent:
+            # Requeued after a worker died; the stages start over
+            sent = 0
+        for event in job.progress[sent:]:
+            yield sse(event['stage'], event)
+            last_sent = loop.time()
+        sent = len(job.progress)
+
+        if job.status == PredictionJob.SUCCEEDED:
+            yield sse('done', job_body(job))
+            return
+        if job.status == PredictionJob.FAILED:
+            yield sse('error', job_body(job))
+            return
+        if loop.time() >= deadline:
+            yield sse('timeout', job_body(job))
+            return
+        if loop.time() - last_sent >= SSE_KEEPALIVE_INTERVAL:
+            yield ': keepalive\n\n'
+            last_sent = loop.time()
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+@csrf_exempt
+@require_POST
+async def predict(request):
+    """
+    Queue a prediction like /api/v1/predict/. With `wait` (seconds) in the
+    body, answer with the finished job instead of 202 if it completes in time.
+    """
+    job, data = await queue_job(request)
+    if job is None:
+        return data
+
+    if data['wait']:
+        job = await wait_for_job(job.id, data['wait'])
+
+    finished = job.status in (PredictionJob.SUCCEEDED, PredictionJob.FAILED)
+    return JsonResponse(job_body(job), status=200 if finished else 202)
+
+
+@csrf_exempt
+@require_POST
+async def predict_stream(request):
+    """
+    Queue a prediction like /async/predict/ and stream its progress as
+    Server-Sent Events, so the price can be shown before the plots are ready.
+    """
+    job, data = await queue_job(request)
+    if job is None:
+        return data
+
+    response = StreamingHttpResponse(job_events(job, ASYNC_PREDICT_STREAM_TIMEOUT), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def predictions(request):
+    """The user's stored predictions, with the filters and cursor pages of /api/v1/predictions/."""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+
+    queryset = StockPrediction.objects.filter(user=user).select_related('user')
+
+    # Fetch params
+    ticker = request.GET.get('ticker')
+    date_from = request.GET.get('date_from')
+    date_to = request.GET.get('date_to')
+    if ticker:
+        queryset = queryset.filter(stock_symbol=ticker)
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__lte=date_to)
+
+    def paginate():
+        paginator = PredictionCursorPagination()
+        page = paginator.paginate_queryset(queryset, Request(request))
+        return paginator.get_paginated_response(StockPredictionSerializer(page, many=True).data).data
+
+    return JsonResponse(await sync_to_async(paginate)())
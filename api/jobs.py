@@ -0,0 +1,77 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import PredictionJob
+from .services import NoDataError, create_prediction
+from stock_insight.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_prediction(user, ticker, plots=True):
+    """Queue a prediction for the worker and return the job."""
+    with timer('db_insert'):
+        return PredictionJob.objects.create(user=user, ticker=ticker, plots=plots)
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to running and return its id, or
+    None if the queue is empty. Safe with several workers polling at once.
+    """
+    while True:
+        job_id = (
+            PredictionJob.objects.filter(status=PredictionJob.QUEUED)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = PredictionJob.objects.filter(id=job_id, status=PredictionJob.QUEUED).update(
+            status=PredictionJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return job_id
+        # Another worker got it first; try the next one
+
+
+def requeue_stale_jobs(timeout):
+    """Put jobs that have been running for longer than `timeout` seconds back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return PredictionJob.objects.filter(status=PredictionJob.RUNNING, started_at__lt=cutoff).update(
+        status=PredictionJob.QUEUED, started_at=None, progress=[]
+    )
+
+
+def fail_jobs(job_ids, error):
+    """Mark claimed jobs that will never finish as failed."""
+    return PredictionJob.objects.filter(id__in=job_ids, status=PredictionJob.RUNNING).update(
+        status=PredictionJob.FAILED, error=error, finished_at=timezone.now()
+    )
+
+
+def run_job(job_id):
+    """Run a claimed job and record its outcome."""
+    job = PredictionJob.objects.select_related('user').get(id=job_id)
+    events = []
+
+    def report(stage, **data):
+        # Read by the streaming predict endpoint while the job runs
+        events.append(dict(data, stage=stage))
+        PredictionJob.objects.filter(id=job_id).update(progress=events)
+
+    try:
+        result, stock_prediction = create_prediction(job.user, job.ticker, plots=job.plots, progress=report)
+    except NoDataError as e:
+        fields = {'status': PredictionJob.FAILED, 'error': str(e)}
+    except Exception as e:
+        logger.error(f"Prediction job {job_id} for {job.ticker} failed: {e}")
+        fields = {'status': PredictionJob.FAILED, 'error': str(e)}
+    else:
+        fields = {'status': PredictionJob.SUCCEEDED, 'result': result, 'prediction': stock_prediction}
+
+    PredictionJob.objects.filter(id=job_id).update(finished_at=timezone.now(), **fields)
+    return fields['status']
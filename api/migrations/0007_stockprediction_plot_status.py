@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_remove_telegramuser_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockprediction',
+            name='plot_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', help_text='Whether the files in plot_urls have been rendered yet', max_length=10),
+        ),
+    ]
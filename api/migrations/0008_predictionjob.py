@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_stockprediction_plot_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('result', models.JSONField(blank=True, default=dict, help_text='Prediction result returned to the client')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('prediction', models.ForeignKey(blank=True, help_text='Prediction created by this job', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='api.stockprediction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
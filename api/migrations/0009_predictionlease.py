@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_predictionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Ticker and trading day being computed', max_length=64, unique=True)),
+                ('owner', models.CharField(help_text='Process holding the lease', max_length=128)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('result', models.JSONField(blank=True, help_text='Shared result handed to every waiter', null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('expires_at', models.DateTimeField(help_text='A running lease past this time may be taken over')),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
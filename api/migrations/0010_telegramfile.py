@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_predictionlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the uploaded file', max_length=64, unique=True)),
+                ('file_id', models.CharField(help_text='Telegram file_id to resend the file without uploading it', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
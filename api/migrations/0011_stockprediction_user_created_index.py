@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_telegramfile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockprediction',
+            index=models.Index(fields=['user', 'created_at'], name='prediction_user_created_idx'),
+        ),
+    ]
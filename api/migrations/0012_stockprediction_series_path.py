@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_stockprediction_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='plots',
+            field=models.BooleanField(default=True, help_text='Render PNG plots; without them only the series is stored'),
+        ),
+        migrations.AddField(
+            model_name='stockprediction',
+            name='series_path',
+            field=models.CharField(blank=True, default='', help_text='Path to the float32 series file served by /predictions/<id>/series/', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='stockprediction',
+            name='plot_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='ready', help_text='Whether the files in plot_urls have been rendered yet', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_stockprediction_series_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='progress',
+            field=models.JSONField(blank=True, default=list, help_text='Stage events reported while the job runs, oldest first'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:22
+
+import os
+
+from django.db import migrations, models
+
+
+def resolve_pending(apps, schema_editor):
+    """Rows left "pending" by a render whose outcome was never recorded."""
+    StockPrediction = apps.get_model('api', 'StockPrediction')
+    for prediction in StockPrediction.objects.filter(plot_status='pending').only('id', 'plot_urls'):
+        rendered = bool(prediction.plot_urls) and all(os.path.exists(path) for path in prediction.plot_urls)
+        prediction.plot_status = 'ready' if rendered else 'failed'
+        prediction.save(update_fields=['plot_status'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_predictionjob_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_pending, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockprediction',
+            name='plot_status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='ready', help_text='Whether the plots in plot_urls rendered, failed or were not asked for', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_remove_plot_pending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionjob',
+            name='ticker',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockprediction',
+            name='stock_symbol',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 import json
+from ml_model.tickers import TICKER_MAX_LENGTH
 
 # Create your models here.
 
@@ -20,8 +21,17 @@ class StockPrediction(models.Model):
     """
     Model to store stock prediction results with metrics and plot file paths
     """
+    PLOT_READY = 'ready'
+    PLOT_FAILED = 'failed'
+    PLOT_SKIPPED = 'skipped'
+    PLOT_STATUS_CHOICES = [
+        (PLOT_READY, 'Ready'),
+        (PLOT_FAILED, 'Failed'),
+        (PLOT_SKIPPED, 'Skipped'),
+    ]
+
     # Basic prediction info
-    stock_symbol = models.CharField(max_length=10, db_index=True)
+    stock_symbol = models.CharField(max_length=TICKER_MAX_LENGTH, db_index=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='predictions')
     
     # Prediction results
@@ -38,13 +48,34 @@ class StockPrediction(models.Model):
         default=list,
         help_text="List of URLs/paths to generated PNG plots"
     )
+    plot_status = models.CharField(
+        max_length=10,
+        choices=PLOT_STATUS_CHOICES,
+        default=PLOT_READY,
+        help_text="Whether the plots in plot_urls rendered, failed or were not asked for"
+    )
+
+    # Actual and predicted closes of the test segment, see ml_model.series
+    series_path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Path to the float32 series file served by /predictions/<id>/series/"
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A user's history in date order, as paginated by the predictions list
+            models.Index(fields=['user', 'created_at'], name='prediction_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.stock_symbol} - {self.next_day_price} (Predicted on {self.created_at.date()})"
+
     
 
 class TelegramUser(models.Model):
@@ -68,4 +99,86 @@ class TelegramUser(models.Model):
     
     def __str__(self):
        return f"{self.username or 'Unknown'} ({self.chat_id})"
-   
\ No newline at end of file
+
+
+class PredictionJob(models.Model):
+    """
+    Model to queue prediction requests for the prediction worker
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prediction_jobs')
+    ticker = models.CharField(max_length=TICKER_MAX_LENGTH)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    plots = models.BooleanField(default=True, help_text="Render PNG plots; without them only the series is stored")
+
+    # Outcome
+    result = models.JSONField(default=dict, blank=True, help_text="Prediction result returned to the client")
+    error = models.TextField(blank=True, default='')
+    progress = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Stage events reported while the job runs, oldest first"
+    )
+    prediction = models.ForeignKey(
+        StockPrediction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        help_text="Prediction created by this job"
+    )
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.pk}: {self.ticker} ({self.status})"
+
+
+class PredictionLease(models.Model):
+    """
+    Model to coordinate identical in-flight predictions across processes
+    """
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    key = models.CharField(max_length=64, unique=True, help_text="Ticker and trading day being computed")
+    owner = models.CharField(max_length=128, help_text="Process holding the lease")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+    result = models.JSONField(null=True, blank=True, help_text="Shared result handed to every waiter")
+    error = models.TextField(blank=True, default='')
+    expires_at = models.DateTimeField(help_text="A running lease past this time may be taken over")
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+class TelegramFile(models.Model):
+    """
+    Model to remember the Telegram file_id of plots already uploaded by the bot
+    """
+    content_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the uploaded file")
+    file_id = models.CharField(max_length=255, help_text="Telegram file_id to resend the file without uploading it")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} -> {self.file_id}"
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PredictionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's predictions, newest first. Each page is an
+    index range scan on (user, created_at), however deep the client pages.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    # id breaks ties between predictions created in the same instant
+    ordering = ('-created_at', '-id')
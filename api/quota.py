@@ -0,0 +1,42 @@
+from datetime import date
+
+from decouple import config
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from stock_insight.metrics import timer
+
+# Predictions a free account may request per day
+DAILY_FREE_PREDICTIONS = config('DAILY_FREE_PREDICTIONS', default=5, cast=int)
+
+
+@timer('quota')
+def consume_quota(model, today=None, defaults=None, limit=DAILY_FREE_PREDICTIONS, **lookup):
+    """
+    Count one prediction request against the quota row of `model` (UserProfile
+    or TelegramUser) matching `lookup`. Returns False, counting nothing, if a
+    free account has used up today's quota.
+
+    The check, the day rollover and the increment happen in one conditional
+    UPDATE, so concurrent requests can't both take the last slot. A missing
+    row is created with `defaults`.
+    """
+    today = today or date.today()
+    new_day = ~Q(last_request_date=today)
+    allowed = Q(is_pro=True) | new_day | Q(daily_request_count__lt=limit)
+    counted = model.objects.filter(allowed, **lookup).update(
+        daily_request_count=Case(When(new_day, then=Value(1)), default=F('daily_request_count') + 1),
+        last_request_date=today,
+    )
+    if counted:
+        return True
+    if model.objects.filter(**lookup).exists():
+        return False
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), daily_request_count=1, last_request_date=today)
+        return True
+    except IntegrityError:
+        # Someone created it first; count against their row
+        return consume_quota(model, today=today, defaults=defaults, limit=limit, **lookup)
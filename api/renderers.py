@@ -0,0 +1,17 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class Float32SeriesRenderer(BaseRenderer):
+    """
+    Passes the raw bytes of a prediction's series file through unchanged:
+    little-endian float32 rows of days since 1970-01-01, actual and predicted
+    closes (see ml_model.series). Selected with `?format=bin` or
+    `Accept: application/octet-stream`.
+    """
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
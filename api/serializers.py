@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import StockPrediction, TelegramUser
+from .models import StockPrediction, TelegramUser, PredictionJob
 from django.contrib.auth.models import User
         
         
@@ -14,9 +14,16 @@ class StockPredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockPrediction
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at', 'plot_urls', 'metrics_json')
+        read_only_fields = ('created_at', 'updated_at', 'plot_urls', 'plot_status', 'series_path', 'metrics_json')
         
         
+class PredictionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PredictionJob
+        fields = ('id', 'ticker', 'plots', 'status', 'progress', 'result', 'error', 'prediction', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
+
+
 class TelegramUserSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
         slug_field='username',
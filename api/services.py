@@ -0,0 +1,96 @@
+import logging
+from datetime import date
+
+from .models import StockPrediction
+from .singleflight import single_flight
+from stock_insight.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+
+class NoDataError(Exception):
+    """Raised when no price history is available for a ticker."""
+
+
+def no_progress(stage, **data):
+    pass
+
+
+def compute_prediction(ticker, plots=True, progress=no_progress):
+    """
+    Fetch history for `ticker` and run the (cached) prediction, with its plots
+    unless `plots` is False.
+
+    `progress(stage, **data)` is called as each stage completes: "fetched"
+    with the number of bars, "inference" with the price and metrics, which
+    comes before the plots are rendered, and "plots" with their paths and
+    status. A failed render doesn't fail the prediction; it is returned with
+    `plot_status` "failed" and no plots.
+
+    Returns the JSON-ready prediction payload, or None if there is no data.
+    """
+    from ml_model.predict_utils import fetch_ohlcv_data
+    from ml_model.cache import cached_predict_with_plot
+
+    df = fetch_ohlcv_data(ticker)
+    if df.empty:
+        return None
+    progress('fetched', bars=len(df))
+
+    result = cached_predict_with_plot(df, ticker, defer_plots=True, plots=plots)
+    progress('inference', next_day_price=result['next_day_price'], metrics=result['metrics'])
+
+    plot_future = result.pop('plot_future', None)
+    if plot_future is not None:
+        try:
+            plot_future.result()
+            result['plot_status'] = StockPrediction.PLOT_READY
+        except Exception as e:
+            logger.error(f"Plot rendering failed for {ticker}, saving the prediction without plots: {e}")
+            result['plot_status'] = StockPrediction.PLOT_FAILED
+            result['plot_urls'] = []
+    if plots:
+        progress('plots', plot_urls=result['plot_urls'], plot_status=result['plot_status'])
+    return result
+
+
+def create_prediction(user, ticker, plots=True, progress=no_progress):
+    """
+    Run the prediction for `ticker` and save it for `user`, skipping the PNG
+    plots if `plots` is False. Stages are reported to `progress` as in
+    compute_prediction, followed by "saved" with the prediction's id.
+
+    Identical requests from any API worker, job worker or the bot share a
+    single computation per ticker and day; the others wait for its result.
+    Returns `(result, stock_prediction)`.
+    """
+    ticker = ticker.upper()
+    key = f"{ticker}:{date.today().isoformat()}" + ("" if plots else ":series")
+    computed_here = []
+
+    def compute():
+        computed_here.append(True)
+        return compute_prediction(ticker, plots, progress)
+
+    result = single_flight(key, compute)
+    if result is None:
+        raise NoDataError("No data found for the ticker")
+    if not computed_here:
+        # Another process computed it; its stages happened there
+        progress('inference', next_day_price=result['next_day_price'], metrics=result['metrics'])
+        if plots:
+            progress('plots', plot_urls=result['plot_urls'], plot_status=result['plot_status'])
+
+    with timer('db_insert'):
+        stock_prediction = StockPrediction.objects.create(
+            stock_symbol=ticker,
+            user=user,
+            next_day_price=result['next_day_price'],
+            plot_urls=result['plot_urls'],
+            plot_status=result['plot_status'],
+            series_path=result['series_path'],
+            metrics_json=result['metrics']
+        )
+    progress('saved', id=stock_prediction.id)
+    result = dict(result, id=stock_prediction.id)
+    return result, stock_prediction
@@ -0,0 +1,98 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from decouple import config
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PredictionLease
+
+logger = logging.getLogger(__name__)
+
+# A leader that hasn't finished within this many seconds is presumed dead
+SINGLEFLIGHT_LEASE_SECONDS = config('SINGLEFLIGHT_LEASE_SECONDS', default=120, cast=int)
+# How long a finished result is still handed to requests that arrive late
+SINGLEFLIGHT_RESULT_TTL = config('SINGLEFLIGHT_RESULT_TTL', default=30, cast=int)
+SINGLEFLIGHT_POLL_INTERVAL = 0.25
+
+
+class SingleFlightError(Exception):
+    """Raised in waiters when the process computing their result failed."""
+
+
+def owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def try_acquire(key, owner, lease_seconds=SINGLEFLIGHT_LEASE_SECONDS, result_ttl=SINGLEFLIGHT_RESULT_TTL):
+    """
+    Become the process computing `key`. Succeeds if nobody holds the lease,
+    the holder's lease expired, or the last result is older than `result_ttl`.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    try:
+        with transaction.atomic():
+            PredictionLease.objects.create(key=key, owner=owner, expires_at=expires_at, updated_at=now)
+        return True
+    except IntegrityError:
+        pass
+
+    takeover = Q(status=PredictionLease.RUNNING, expires_at__lt=now) | Q(
+        status__in=[PredictionLease.DONE, PredictionLease.FAILED],
+        updated_at__lt=now - timedelta(seconds=result_ttl),
+    )
+    taken = PredictionLease.objects.filter(takeover, key=key).update(
+        owner=owner, status=PredictionLease.RUNNING, result=None, error='',
+        expires_at=expires_at, updated_at=now,
+    )
+    return bool(taken)
+
+
+def finish(key, owner, result=None, error=None):
+    status = PredictionLease.FAILED if error is not None else PredictionLease.DONE
+    PredictionLease.objects.filter(key=key, owner=owner).update(
+        status=status, result=result, error=error or '', updated_at=timezone.now()
+    )
+
+
+def single_flight(key, compute):
+    """
+    Run `compute()` in at most one process at a time for `key` and return its
+    JSON-serializable result to every caller that asked in the meantime,
+    whichever gunicorn worker, job worker or bot process they are in.
+    """
+    owner = owner_id()
+    while True:
+        if try_acquire(key, owner):
+            try:
+                result = compute()
+            except Exception as e:
+                finish(key, owner, error=str(e) or type(e).__name__)
+                raise
+            finish(key, owner, result=result)
+            return result
+
+        logger.info(f"Waiting for in-flight computation of {key}")
+        while True:
+            time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+            lease = PredictionLease.objects.filter(key=key).values('status', 'result', 'error', 'expires_at').first()
+            if lease is None:
+                break
+            if lease['status'] == PredictionLease.DONE:
+                return lease['result']
+            if lease['status'] == PredictionLease.FAILED:
+                raise SingleFlightError(lease['error'])
+            if lease['expires_at'] < timezone.now():
+                # The leader died; compete to take over
+                break
+
+
+def purge_leases(older_than=timedelta(days=1)):
+    """Delete finished or abandoned leases last touched before `older_than` ago."""
+    return PredictionLease.objects.filter(updated_at__lt=timezone.now() - older_than).delete()[0]
@@ -1,3 +1,458 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import jobs, singleflight
+from .models import PredictionJob, PredictionLease, StockPrediction, UserProfile
+from .quota import consume_quota
+
+
+def relative(url):
+    """Path and query of a pagination link, which DRF makes absolute."""
+    return url and urlsplit(url)._replace(scheme='', netloc='').geturl()
+
+
+def make_predictions(user, count, same_timestamp=False):
+    """Bulk-create `count` predictions for `user`, a minute apart unless `same_timestamp`."""
+    rows = StockPrediction.objects.bulk_create(
+        StockPrediction(stock_symbol=f"T{i:03d}", user=user, next_day_price=i) for i in range(count)
+    )
+    now = timezone.now()
+    for i, row in enumerate(rows):
+        row.created_at = now if same_timestamp else now - timedelta(minutes=i)
+    StockPrediction.objects.bulk_update(rows, ['created_at'])
+    return rows
+
+
+def in_threads(count, fn):
+    """
+    Call `fn()` from `count` threads released at the same moment and return
+    the results. Each thread closes its own database connection when done.
+    """
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        try:
+            return fn()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(count) as pool:
+        return [f.result() for f in [pool.submit(run) for _ in range(count)]]
+
+
+class PredictionListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.other = User.objects.create_user('bob', password='pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, url, link):
+        """Follow `link` ('next' or 'previous') from `url` and return the ids of every page, in order."""
+        ids = []
+        while url:
+            page = self.get(url)
+            ids.extend(row['id'] for row in page['results'])
+            url = relative(page[link])
+        return ids
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        make_predictions(self.user, 200)
+        # One query for the JWT's user, one for the page; users are joined, not fetched per row
+        for page_size in (1, 50, 200):
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                page = self.get(f"/api/v1/predictions/?page_size={page_size}")
+            self.assertEqual(len(page['results']), page_size)
+
+    def test_next_cursors_visit_every_row_once_newest_first(self):
+        rows = make_predictions(self.user, 23)
+        make_predictions(self.other, 5)
+
+        ids = self.walk("/api/v1/predictions/?page_size=5", 'next')
+
+        self.assertEqual(ids, [row.id for row in rows])
+
+    def test_cursors_are_stable_when_timestamps_tie(self):
+        rows = make_predictions(self.user, 12, same_timestamp=True)
+
+        ids = self.walk("/api/v1/predictions/?page_size=5", 'next')
+
+        # Ties on created_at are broken by id, newest first
+        self.assertEqual(ids, sorted((row.id for row in rows), reverse=True))
+
+    def test_previous_cursors_walk_back_over_the_same_rows(self):
+        make_predictions(self.user, 17)
+        pages = []
+        url = "/api/v1/predictions/?page_size=5"
+        while url:
+            page = self.get(url)
+            pages.append([row['id'] for row in page['results']])
+            url = relative(page['next'])
+
+        last = self.get(relative(page['previous']))
+
+        self.assertEqual([row['id'] for row in last['results']], pages[-2])
+
+    def test_rows_added_while_paging_are_neither_repeated_nor_skipped(self):
+        rows = make_predictions(self.user, 10)
+        first = self.get("/api/v1/predictions/?page_size=4")
+
+        # A new prediction arrives before the client asks for page two
+        StockPrediction.objects.create(stock_symbol='NEW', user=self.user, next_day_price=1)
+        rest = self.walk(relative(first['next']), 'next')
+
+        ids = [row['id'] for row in first['results']] + rest
+        self.assertEqual(ids, [row.id for row in rows])
+
+
+class PlotRendererTests(SimpleTestCase):
+    def setUp(self):
+        from ml_model import plotting
+
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        patcher = mock.patch.object(plotting, 'render_plots', lambda *args: self.release.wait(5) and args[4])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # One render at a time and one more waiting
+        self.renderer = plotting.PlotRenderer(max_workers=1, max_pending=1)
+
+    def submit(self, ticker):
+        return self.renderer.submit(None, None, None, None, ticker, None)
+
+    def test_submit_blocks_while_the_queue_is_full(self):
+        futures = [self.submit('AAPL'), self.submit('MSFT')]
+        third = threading.Thread(target=lambda: futures.append(self.submit('GOOG')))
+        third.start()
+
+        third.join(0.2)
+        self.assertTrue(third.is_alive())
+
+        self.release.set()
+        third.join(5)
+        self.assertFalse(third.is_alive())
+        self.assertEqual([f.result(5) for f in futures], ['AAPL', 'MSFT', 'GOOG'])
+
+    def test_failed_render_frees_its_slot(self):
+        from ml_model import plotting
+
+        with mock.patch.object(plotting, 'render_plots', side_effect=RuntimeError('boom')), \
+                self.assertLogs('ml_model.plotting', 'ERROR'):
+            for _ in range(3):
+                with self.assertRaises(RuntimeError):
+                    self.submit('AAPL').result(5)
+
+
+
+class PredictionCacheTests(SimpleTestCase):
+    key = 'prediction:AAPL:2025-01-02:abc'
+
+    def setUp(self):
+        from ml_model.cache import LocMemBackend, PredictionCache
+
+        self.cache = PredictionCache(LocMemBackend(ttl=60))
+        # key() reads the model version; these tests must not load the model for it
+        patcher = mock.patch('ml_model.cache.registry', mock.Mock(version='abc'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def file(self, name):
+        path = os.path.join(self.directory.name, name)
+        open(path, 'wb').close()
+        return path
+
+    def result(self, plots=True):
+        plot_urls = [self.file('history.png'), self.file('prediction.png')] if plots else []
+        return {'next_day_price': 1.0, 'plot_urls': plot_urls, 'series_path': self.file('series.f32')}
+
+    def test_hit_returns_a_copy_of_the_stored_result(self):
+        self.cache.set(self.key, self.result())
+
+        hit = self.cache.get(self.key)
+        hit['plot_urls'].clear()
+
+        self.assertEqual(hit['plot_status'], 'ready')
+        self.assertEqual(len(self.cache.get(self.key)['plot_urls']), 2)
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_entry_whose_files_were_removed_is_dropped(self):
+        result = self.result()
+        self.cache.set(self.key, result)
+        os.remove(result['plot_urls'][0])
+
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertIsNone(self.cache.backend.get(self.key))
+
+    def test_entry_without_plots_only_serves_plotless_requests(self):
+        self.cache.set(self.key, self.result(plots=False))
+
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(self.cache.get(self.key, plots=False)['plot_status'], 'skipped')
+
+    def test_entry_is_stored_once_its_plots_render(self):
+        from concurrent.futures import Future
+        from ml_model import cache as cache_module
+
+        future = Future()
+        computed = dict(self.result(), plot_future=future)
+        df = mock.Mock(index=[date(2025, 1, 2)])
+
+        with mock.patch.object(cache_module, 'predict_with_plot', return_value=computed) as predict:
+            self.cache.predict_with_plot(df, 'AAPL', defer_plots=True)
+            key = self.cache.key('AAPL', df)
+            self.assertIsNone(self.cache.get(key))
+
+            future.set_result(computed['plot_urls'])
+            hit = self.cache.predict_with_plot(df, 'AAPL', defer_plots=True)
+
+        predict.assert_called_once()
+        self.assertNotIn('plot_future', hit)
+
+    def test_failed_render_is_not_stored(self):
+        from concurrent.futures import Future
+        from ml_model import cache as cache_module
+
+        future = Future()
+        df = mock.Mock(index=[date(2025, 1, 2)])
+
+        with mock.patch.object(cache_module, 'predict_with_plot', return_value=dict(self.result(), plot_future=future)):
+            self.cache.predict_with_plot(df, 'AAPL', defer_plots=True)
+        future.set_exception(RuntimeError('render failed'))
+
+        self.assertIsNone(self.cache.get(self.cache.key('AAPL', df)))
+
+
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        first = jobs.enqueue_prediction(self.user, 'AAPL')
+        second = jobs.enqueue_prediction(self.user, 'MSFT')
+
+        self.assertEqual([jobs.claim_next_job() for _ in range(3)], [first.id, second.id, None])
+        first.refresh_from_db()
+        self.assertEqual(first.status, PredictionJob.RUNNING)
+        self.assertIsNotNone(first.started_at)
+
+    def test_successful_job_stores_its_result(self):
+        job = jobs.enqueue_prediction(self.user, 'AAPL', plots=False)
+        prediction = StockPrediction.objects.create(stock_symbol='AAPL', user=self.user, next_day_price=1)
+        result = {'next_day_price': 1}
+        jobs.claim_next_job()
+
+        with mock.patch.object(jobs, 'create_prediction', return_value=(result, prediction)) as create:
+            self.assertEqual(jobs.run_job(job.id), PredictionJob.SUCCEEDED)
+
+        create.assert_called_once_with(self.user, 'AAPL', plots=False, progress=mock.ANY)
+        job.refresh_from_db()
+        self.assertEqual((job.result, job.prediction, job.error), (result, prediction, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_records_the_error(self):
+        job = jobs.enqueue_prediction(self.user, 'NOPE')
+        jobs.claim_next_job()
+
+        with mock.patch.object(jobs, 'create_prediction', side_effect=jobs.NoDataError('No data found for the ticker')):
+            self.assertEqual(jobs.run_job(job.id), PredictionJob.FAILED)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (PredictionJob.FAILED, 'No data found for the ticker'))
+
+    def test_progress_is_saved_as_the_job_runs(self):
+        job = jobs.enqueue_prediction(self.user, 'AAPL')
+        jobs.claim_next_job()
+
+        def create_prediction(user, ticker, plots, progress):
+            progress('fetched', bars=10)
+            raise RuntimeError('boom')
+
+        with mock.patch.object(jobs, 'create_prediction', create_prediction), self.assertLogs('api.jobs', 'ERROR'):
+            jobs.run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.progress, [{'stage': 'fetched', 'bars': 10}])
+        self.assertEqual(job.error, 'boom')
+
+    def test_only_stale_running_jobs_are_requeued(self):
+        stale = jobs.enqueue_prediction(self.user, 'AAPL')
+        fresh = jobs.enqueue_prediction(self.user, 'MSFT')
+        jobs.claim_next_job()
+        jobs.claim_next_job()
+        PredictionJob.objects.filter(id=stale.id).update(started_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=60), 1)
+        self.assertEqual(jobs.claim_next_job(), stale.id)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, PredictionJob.RUNNING)
+
+
+class ConcurrentJobQueueTests(TransactionTestCase):
+    def test_concurrent_workers_never_claim_the_same_job(self):
+        user = User.objects.create_user('alice', password='pw')
+        queued = {jobs.enqueue_prediction(user, f"T{i}").id for i in range(5)}
+
+        claimed = in_threads(8, jobs.claim_next_job)
+
+        self.assertEqual(sorted(filter(None, claimed)), sorted(queued))
+
+
+class PredictRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.auth = f"Bearer {AccessToken.for_user(cls.user)}"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def assertNothingCharged(self):
+        self.assertFalse(PredictionJob.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user).daily_request_count, 0)
+
+    def test_invalid_tickers_are_rejected_before_the_quota(self):
+        for ticker in ('../etc', 'A' * 21, 'AA PL', ['AAPL']):
+            with self.subTest(ticker=ticker):
+                response = self.client.post('/api/v1/predict/', {'ticker': ticker}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertNothingCharged()
+
+    def test_ticker_is_queued_uppercased(self):
+        response = self.client.post('/api/v1/predict/', {'ticker': ' brk-b '}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(PredictionJob.objects.get().ticker, 'BRK-B')
+        self.assertEqual(UserProfile.objects.get(user=self.user).daily_request_count, 1)
+
+    async def test_async_predict_rejects_invalid_tickers_before_the_quota(self):
+        for ticker in ('../etc', 'A' * 21):
+            with self.subTest(ticker=ticker):
+                response = await self.async_client.post(
+                    '/api/v1/async/predict/', {'ticker': ticker},
+                    content_type='application/json', headers={'Authorization': self.auth},
+                )
+                self.assertEqual(response.status_code, 400)
+        await sync_to_async(self.assertNothingCharged)()
+
+
+class SingleFlightTests(TestCase):
+    key = 'AAPL:2025-01-02'
+
+    def test_second_owner_waits_while_the_lease_is_held(self):
+        self.assertTrue(singleflight.try_acquire(self.key, 'a'))
+        self.assertFalse(singleflight.try_acquire(self.key, 'b'))
+
+    def test_expired_lease_is_taken_over(self):
+        singleflight.try_acquire(self.key, 'a', lease_seconds=-1)
+
+        self.assertTrue(singleflight.try_acquire(self.key, 'b'))
+        self.assertEqual(PredictionLease.objects.get(key=self.key).owner, 'b')
+
+    def test_finished_result_is_reused_until_it_is_stale(self):
+        singleflight.try_acquire(self.key, 'a')
+        singleflight.finish(self.key, 'a', result={'price': 1})
+
+        self.assertFalse(singleflight.try_acquire(self.key, 'b', result_ttl=60))
+        self.assertTrue(singleflight.try_acquire(self.key, 'b', result_ttl=-1))
+
+    def test_waiter_gets_the_leaders_result(self):
+        singleflight.try_acquire(self.key, 'a')
+        singleflight.finish(self.key, 'a', result={'price': 1})
+        compute = mock.Mock()
+
+        with mock.patch.object(singleflight, 'SINGLEFLIGHT_POLL_INTERVAL', 0):
+            self.assertEqual(singleflight.single_flight(self.key, compute), {'price': 1})
+        compute.assert_not_called()
+
+    def test_waiter_gets_the_leaders_error(self):
+        singleflight.try_acquire(self.key, 'a')
+        singleflight.finish(self.key, 'a', error='no data')
+
+        with mock.patch.object(singleflight, 'SINGLEFLIGHT_POLL_INTERVAL', 0):
+            with self.assertRaisesMessage(singleflight.SingleFlightError, 'no data'):
+                singleflight.single_flight(self.key, mock.Mock())
+
+
+class ConcurrentSingleFlightTests(TransactionTestCase):
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+
+        def compute():
+            calls.append(True)
+            threading.Event().wait(0.2)
+            return {'price': 1}
+
+        with mock.patch.object(singleflight, 'SINGLEFLIGHT_POLL_INTERVAL', 0.01):
+            results = in_threads(4, lambda: singleflight.single_flight('AAPL:2025-01-02', compute))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'price': 1}] * 4)
+
+
+class QuotaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+
+    def consume(self, today=date(2025, 1, 2)):
+        return consume_quota(UserProfile, user=self.user, today=today, limit=3)
+
+    def test_free_account_stops_at_the_limit(self):
+        self.assertEqual([self.consume() for _ in range(5)], [True, True, True, False, False])
+        self.assertEqual(UserProfile.objects.get(user=self.user).daily_request_count, 3)
+
+    def test_count_restarts_on_a_new_day(self):
+        for _ in range(3):
+            self.consume()
+
+        self.assertTrue(self.consume(today=date(2025, 1, 3)))
+        self.assertEqual(UserProfile.objects.get(user=self.user).daily_request_count, 1)
+
+    def test_pro_account_has_no_limit(self):
+        UserProfile.objects.filter(user=self.user).update(is_pro=True)
+
+        self.assertTrue(all(self.consume() for _ in range(10)))
+
+    def test_missing_row_is_created_and_counted(self):
+        UserProfile.objects.filter(user=self.user).delete()
+
+        self.assertTrue(self.consume())
+        self.assertEqual(UserProfile.objects.get(user=self.user).daily_request_count, 1)
+
+
+class ConcurrentQuotaTests(TransactionTestCase):
+    def test_concurrent_requests_cannot_share_the_last_slots(self):
+        user = User.objects.create_user('alice', password='pw')
+
+        results = in_threads(8, lambda: consume_quota(UserProfile, user=user, limit=3))
+
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(UserProfile.objects.get(user=user).daily_request_count, 3)
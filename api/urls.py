@@ -1,5 +1,6 @@
 from django.urls import path, include
-from .views import RegisterUserView, StockPredictionViewSet
+from .views import RegisterUserView, StockPredictionViewSet, PredictionJobDetailView, PredictionSeriesView
+from . import async_views
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 urlpatterns = [
@@ -7,4 +8,9 @@ urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('predict/', StockPredictionViewSet.as_view({'post': 'create'}), name='stock_prediction_create'),
     path('predictions/', StockPredictionViewSet.as_view({ 'get' : 'list' }), name='stock_prediction_list'),
+    path('predictions/<int:pk>/series/', PredictionSeriesView.as_view(), name='stock_prediction_series'),
+    path('async/predict/', async_views.predict, name='async_stock_prediction_create'),
+    path('async/predict/stream/', async_views.predict_stream, name='async_stock_prediction_stream'),
+    path('async/predictions/', async_views.predictions, name='async_stock_prediction_list'),
+    path('jobs/<int:pk>/', PredictionJobDetailView.as_view(), name='prediction_job_detail'),
 ]
\ No newline at end of file
@@ -5,19 +5,26 @@ from rest_framework import viewsets
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from django.http import Http404
 
 # Model and Serializer imports
 from django.contrib.auth.models import User
-from .models import StockPrediction, TelegramUser, UserProfile
-from .serializers import StockPredictionSerializer, TelegramUserSerializer, RegisterUserSerializer, UserSerializer
-
-from datetime import date
+from .models import StockPrediction, TelegramUser, UserProfile, PredictionJob
+from .serializers import StockPredictionSerializer, TelegramUserSerializer, RegisterUserSerializer, UserSerializer, PredictionJobSerializer
 
 # Permission classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
-# ML model utilities
-from ml_model.predict_utils import fetch_ohlcv_data, predict_with_plot
+# Predictions run in the prediction worker (see api.jobs); the web process
+# never imports the ML model utilities
+from .jobs import enqueue_prediction
+from ml_model.tickers import clean_ticker
+from .quota import consume_quota
+from .pagination import PredictionCursorPagination
+from .renderers import Float32SeriesRenderer
+from django.urls import reverse
 
 # Django filters
 from django_filters.rest_framework import DjangoFilterBackend
@@ -57,42 +64,35 @@ class StockPredictionViewSet(viewsets.ModelViewSet):
     filterset_fields = ['stock_symbol', 'user']
     ordering_fields = ['created_at', 'stock_symbol']
     ordering = ['-created_at']
+    pagination_class = PredictionCursorPagination
     
     def create(self, request, *args, **kwargs):
-        """Override create method to handle custom logic if needed
+        """Queue a prediction job for the worker and return 202 with its id.
+        Pass `plots: false` to skip the PNG plots and only store the series.
         """
         try:
             user = request.user
-            profile = get_or_create_user_profile(user)
-
-            # Reset count if new day
-            if profile.last_request_date != date.today():
-                profile.daily_request_count = 0
-                profile.last_request_date = date.today()
+            if not request.data.get('ticker'):
+                return Response({"error": "A ticker is required"}, status=status.HTTP_400_BAD_REQUEST)
+            # Before the quota, so a malformed symbol isn't charged or queued
+            ticker = clean_ticker(request.data.get('ticker'))
+            if ticker is None:
+                return Response({"error": "Invalid ticker symbol"}, status=status.HTTP_400_BAD_REQUEST)
+            plots = request.data.get('plots', True) not in serializers.BooleanField.FALSE_VALUES
 
-            if not profile.is_pro and profile.daily_request_count >= 5:
+            # Count this request, unless today's quota is used up
+            if not consume_quota(UserProfile, user=user):
                 return Response({'error': 'Quota exceeded. Upgrade to Pro.'}, status=429)
 
-            # Count this request
-            profile.daily_request_count += 1
-            profile.save()
-            ticker = request.data.get('ticker')
-            df = fetch_ohlcv_data(ticker)
-            if df.empty:
-                return Response({"error": "No data found for the ticker"}, status=status.HTTP_400_BAD_REQUEST)
-            prediction_result = predict_with_plot(df, ticker)
-            
-            StockPrediction.objects.create(
-                stock_symbol=ticker,
-                user=request.user,
-                next_day_price=prediction_result['next_day_price'],
-                plot_urls=prediction_result['plot_urls'],
-                metrics_json=prediction_result['metrics']
-            )
-            
+            job = enqueue_prediction(user, ticker, plots=plots)
             return Response(
-                {"message": "Prediction created successfully", "data": prediction_result},
-                status=status.HTTP_201_CREATED
+                {
+                    "message": "Prediction job queued",
+                    "job_id": job.id,
+                    "status": job.status,
+                    "status_url": reverse('prediction_job_detail', args=[job.id]),
+                },
+                status=status.HTTP_202_ACCEPTED
             )
         except Exception as e:
             return Response(
@@ -104,7 +104,8 @@ class StockPredictionViewSet(viewsets.ModelViewSet):
         """Override list method to filter predictions by user
         """
         user = self.request.user
-        queryset = self.queryset.filter(user=user)
+        # The serializer shows user.username; join it instead of one query per row
+        queryset = self.queryset.filter(user=user).select_related('user')
         
         # Fetch params
         ticker = request.query_params.get('ticker', None)
@@ -118,10 +119,63 @@ class StockPredictionViewSet(viewsets.ModelViewSet):
         if date_to:
             queryset = queryset.filter(created_at__lte=date_to)
           
-        serializer = self.get_serializer(queryset, many=True)  
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
         
     
+# View for the chart data of a prediction
+class PredictionSeriesView(generics.GenericAPIView):
+    """Actual and predicted closes of a prediction, for clients that draw their own charts.
+    JSON by default; `?format=bin` returns the stored float32 file as is.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, Float32SeriesRenderer]
+
+    def get_queryset(self):
+        return StockPrediction.objects.filter(user=self.request.user).only('id', 'stock_symbol', 'series_path')
+
+    def handle_exception(self, exc):
+        # Errors are reported as JSON even when the binary format was asked for
+        self.request.accepted_renderer, self.request.accepted_media_type = JSONRenderer(), JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def get(self, request, *args, **kwargs):
+        from ml_model.series import read_series
+
+        prediction = self.get_object()
+        if not prediction.series_path:
+            raise Http404("No series stored for this prediction")
+        try:
+            if request.accepted_renderer.format == 'bin':
+                with open(prediction.series_path, 'rb') as f:
+                    data = f.read()
+                return Response(data, headers={'Content-Length': str(len(data))})
+            days, actual, predicted = read_series(prediction.series_path)
+        except FileNotFoundError:
+            raise Http404("The series of this prediction has expired")
+
+        return Response({
+            "id": prediction.id,
+            "ticker": prediction.stock_symbol,
+            "dates": days.astype(str).tolist(),
+            # float32 holds ~7 significant digits; don't print more than that
+            "actual": actual.astype(float).round(4).tolist(),
+            "predicted": predicted.astype(float).round(4).tolist(),
+        })
+
+
+# View for prediction job status
+class PredictionJobDetailView(generics.RetrieveAPIView):
+    """View to poll the status and result of a queued prediction
+    """
+    serializer_class = PredictionJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return PredictionJob.objects.filter(user=self.request.user)
+
+
 # Viewset for Telegram Users
 class TelegramUserViewSet(viewsets.ModelViewSet):
     """Viewset for managing Telegram users
@@ -0,0 +1,74 @@
+"""
+Entry points for prediction worker processes.
+
+Kept free of model imports at module level so spawned processes can unpickle
+these functions before Django is set up.
+"""
+
+
+def init_worker():
+    """Set up Django and warm the model once per worker process."""
+    import django
+
+    django.setup()
+
+    from ml_model.registry import preload
+
+    preload()
+
+
+def run_job(job_id):
+    from django.db import close_old_connections
+
+    from api.jobs import run_job as _run_job
+
+    close_old_connections()
+    return _run_job(job_id)
+
+
+def run_jobs(job_ids):
+    """
+    Run claimed jobs on threads and return their statuses, in order. Jobs
+    that run together share forward passes through ml_model.batching.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(job_ids)) as pool:
+        return list(pool.map(_run_job_in_thread, job_ids))
+
+
+def _run_job_in_thread(job_id):
+    from django.db import connections
+
+    try:
+        return run_job(job_id)
+    finally:
+        # The thread is about to exit; don't leave its connection open
+        connections.close_all()
+
+
+def predict_tickers(tickers):
+    """
+    Predict each ticker from the stored history and return
+    `[(ticker, result or None, error or None), ...]`.
+
+    The tickers run on threads so ml_model.batching merges their forward
+    passes into shared model calls.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(len(tickers), 1)) as pool:
+        return list(pool.map(_predict_ticker, tickers))
+
+
+def _predict_ticker(ticker):
+    from ml_model.cache import cached_predict_with_plot
+    from ml_model.predict_utils import fetch_ohlcv_data
+
+    try:
+        df = fetch_ohlcv_data(ticker)
+        if df.empty:
+            return ticker, None, "No data found for the ticker"
+        return ticker, cached_predict_with_plot(df, ticker), None
+    except Exception as e:
+        return ticker, None, str(e)
@@ -0,0 +1,148 @@
+"""
+Multi-process write contention on the database.
+
+Spawns `--processes` workers, standing in for the gunicorn workers, the
+prediction worker and the bot, that run the app's hot writes for
+`--duration` seconds. The mix is saving predictions, counting quota on
+UserProfile and TelegramUser rows, and reading a page of history. Reports
+operations per second, latency percentiles and "database is locked" errors
+per operation.
+
+By default runs against fresh temporary SQLite files, once with the
+settings' SQLite tuning (WAL, busy timeout, IMMEDIATE transactions) and once
+with Django's stock SQLite behaviour. Pass `--database-url` to run the same
+load against another backend, e.g. a scratch PostgreSQL database; its tables
+are created with migrate and the benchmark rows are left in place.
+
+    python -m benchmarks.db_contention [--processes 4] [--duration 10] [--users 20]
+    python -m benchmarks.db_contention --database-url postgres://localhost/stock_insight_bench
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USER_PREFIX = 'contention-'
+
+CONFIGS = {
+    'tuned': {},
+    # What Django does without the OPTIONS in settings
+    'stock': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_BUSY_TIMEOUT': '5',
+              'SQLITE_TRANSACTION_MODE': 'DEFERRED', 'DB_CONN_MAX_AGE': '0'},
+}
+
+# Relative frequency of each operation in the mix
+OPERATIONS = {'save_prediction': 3, 'profile_quota': 3, 'telegram_quota': 2, 'read_history': 2}
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stock_insight.settings')
+    sys.path.insert(0, BASE_DIR)
+    import django
+    django.setup()
+
+
+def prepare(users):
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from api.models import TelegramUser
+
+    call_command('migrate', verbosity=0)
+    user_ids = []
+    for i in range(users):
+        user, _ = User.objects.get_or_create(username=f'{BENCH_USER_PREFIX}{i}')
+        TelegramUser.objects.get_or_create(chat_id=-(i + 1), defaults={'user': user, 'username': user.username})
+        user_ids.append(user.id)
+    return user_ids
+
+
+def worker(args):
+    user_ids, duration, seed = args
+    setup_django()
+    from django.db import OperationalError, close_old_connections
+    from api.models import StockPrediction, TelegramUser, UserProfile
+    from api.quota import consume_quota
+
+    rng = random.Random(seed)
+    names, weights = zip(*OPERATIONS.items())
+    latencies, errors = defaultdict(list), defaultdict(int)
+    today = date.today()
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        op = rng.choices(names, weights)[0]
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        try:
+            if op == 'save_prediction':
+                StockPrediction.objects.create(stock_symbol='BENCH', user_id=user_id, next_day_price=100,
+                                               plot_urls=[], metrics_json={'mse': 0.0})
+            elif op == 'profile_quota':
+                consume_quota(UserProfile, today=today, limit=10 ** 9, user_id=user_id)
+            elif op == 'telegram_quota':
+                consume_quota(TelegramUser, today=today, limit=10 ** 9, user_id=user_id)
+            else:
+                list(StockPrediction.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:50])
+        except OperationalError as e:
+            errors[op] += 1
+            if 'locked' not in str(e):
+                raise
+            close_old_connections()
+            continue
+        latencies[op].append(time.perf_counter() - start)
+    return dict(latencies), dict(errors)
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values[0] if values else 0.0)
+
+
+def run(label, env, processes, duration, users):
+    os.environ.update(env)
+    # Saves invalidate dashboard cache entries; keep those out of the project's cache
+    os.environ.setdefault('CACHE_LOCATION', tempfile.mkdtemp(prefix='contention-cache-'))
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        user_ids = pool.apply(prepare, (users,))
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        results = pool.map(worker, [(user_ids, duration, seed) for seed in range(processes)])
+
+    print(f"\n{label}: {processes} processes, {duration:.0f} s")
+    print(f"{'operation':<18}{'ops/s':>9}{'p50':>10}{'p99':>10}{'max':>10}{'locked':>8}")
+    for op in OPERATIONS:
+        lat = [x * 1000 for latencies, _ in results for x in latencies.get(op, [])]
+        errors = sum(errs.get(op, 0) for _, errs in results)
+        print(f"{op:<18}{len(lat) / duration:>9.1f}{percentile(lat, 50):>8.1f}ms"
+              f"{percentile(lat, 99):>8.1f}ms{max(lat, default=0):>8.1f}ms{errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per run')
+    parser.add_argument('--users', type=int, default=20, help='Distinct users the writes are spread over')
+    parser.add_argument('--database-url', help='Run against this database instead of temporary SQLite files')
+    args = parser.parse_args()
+
+    if args.database_url:
+        run(args.database_url.split('://')[0], {'DATABASE_URL': args.database_url},
+            args.processes, args.duration, args.users)
+        return
+
+    for label, env in CONFIGS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            run(f"sqlite ({label})", {'DATABASE_URL': f"sqlite:///{tmp}/bench.sqlite3", **env},
+                args.processes, args.duration, args.users)
+        for key in env:
+            os.environ.pop(key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Startup-time budget for the web and bot processes.
+
+Each target runs in a fresh interpreter and reports wall time, peak RSS and
+whether any of the heavy prediction dependencies were imported. Exits with
+status 1 if a target exceeds its budget in `startup_budget.json`.
+
+    python -m benchmarks.startup [--budget benchmarks/startup_budget.json] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+
+HEAVY_MODULES = ('keras', 'tensorflow', 'jax', 'matplotlib', 'sklearn', 'yfinance', 'pandas', 'stripe')
+
+SETUP = "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stock_insight.settings')\n"
+
+TARGETS = {
+    # `manage.py check` loads settings, every app and the URLconf
+    'manage_check': "from django.core.management import execute_from_command_line\n"
+                    "execute_from_command_line(['manage.py', 'check', '--verbosity', '0'])\n",
+    # What a gunicorn worker does before it can answer /healthz/: the hooks in
+    # gunicorn.conf.py around loading the app, then resolving a URL
+    'wsgi_app': "import logging, runpy, types\n"
+                "hooks = runpy.run_path('gunicorn.conf.py')\n"
+                "worker = types.SimpleNamespace(log=logging.getLogger('gunicorn.error'))\n"
+                "if 'post_fork' in hooks: hooks['post_fork'](None, worker)\n"
+                "from stock_insight.wsgi import application\n"
+                "worker.wsgi = application\n"
+                "if 'post_worker_init' in hooks: hooks['post_worker_init'](worker)\n"
+                "from django.urls import resolve\n"
+                "resolve('/healthz/')\n",
+    # Loading the bot command module, before the model is preloaded in main()
+    'telegrambot': "import django\n"
+                   "django.setup()\n"
+                   "import core.management.commands.telegrambot\n",
+}
+
+PROBE = """
+import json, resource, sys, time
+_start = time.perf_counter()
+{setup}{body}
+print(json.dumps({{
+    'seconds': time.perf_counter() - _start,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+def run_target(name):
+    code = PROBE.format(setup=SETUP, body=TARGETS[name], heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', default=DEFAULT_BUDGET)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per target; the fastest one is reported')
+    args = parser.parse_args()
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+
+    failures = []
+    print(f"{'target':<14}{'time':>10}{'rss':>11}  heavy modules")
+    for name in TARGETS:
+        runs = [run_target(name) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r['seconds'])
+        print(f"{name:<14}{best['seconds']:>8.2f} s{best['rss_mb']:>8.0f} MB  {', '.join(best['heavy']) or '-'}")
+
+        limits = budget.get(name, {})
+        if best['seconds'] > limits.get('max_seconds', float('inf')):
+            failures.append(f"{name}: {best['seconds']:.2f} s > {limits['max_seconds']} s")
+        if best['rss_mb'] > limits.get('max_rss_mb', float('inf')):
+            failures.append(f"{name}: {best['rss_mb']:.0f} MB > {limits['max_rss_mb']} MB")
+        forbidden = set(best['heavy']) & set(limits.get('forbidden_modules', []))
+        if forbidden:
+            failures.append(f"{name}: imports {', '.join(sorted(forbidden))}")
+
+    if failures:
+        print("\nStartup budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll targets within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Concurrent-client throughput of the sync (gunicorn, WSGI) and async (uvicorn,
+ASGI) prediction API.
+
+Starts both servers with the same number of worker processes, creates a Pro
+benchmark user in the configured database, then runs `--clients` concurrent
+clients against each server for `--duration` seconds and reports requests per
+second and latency percentiles.
+
+Scenarios:
+  list     GET /api/v1/predictions/ vs GET /api/v1/async/predictions/
+  predict  POST /api/v1/predict/ and poll the job vs POST /api/v1/async/predict/
+           with `wait`; needs `manage.py predictionworker` running
+
+    python -m benchmarks.throughput [--scenario list] [--clients 64] [--workers 3] [--duration 15]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USERNAME = 'benchmark'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_commands(workers):
+    wsgi_port, asgi_port = free_port(), free_port()
+    return {
+        'wsgi': (wsgi_port, ['gunicorn', 'stock_insight.wsgi:application', '--config', 'gunicorn.conf.py',
+                             '--bind', f'127.0.0.1:{wsgi_port}', '--workers', str(workers)]),
+        'asgi': (asgi_port, ['uvicorn', 'stock_insight.asgi:application', '--host', '127.0.0.1',
+                             '--port', str(asgi_port), '--workers', str(workers), '--log-level', 'warning']),
+    }
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/healthz/', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def benchmark_token(seed_predictions):
+    """Create the benchmark user with some stored predictions and return a JWT for it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stock_insight.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from api.models import StockPrediction, UserProfile
+
+    user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+    UserProfile.objects.update_or_create(user=user, defaults={'is_pro': True})
+    missing = seed_predictions - StockPrediction.objects.filter(user=user).count()
+    StockPrediction.objects.bulk_create([
+        StockPrediction(stock_symbol='BENCH', user=user, next_day_price=100.0, plot_urls=[], metrics_json={})
+        for _ in range(max(missing, 0))
+    ])
+    return str(RefreshToken.for_user(user).access_token)
+
+
+async def list_request(client, mode):
+    path = '/api/v1/predictions/' if mode == 'wsgi' else '/api/v1/async/predictions/'
+    response = await client.get(path)
+    response.raise_for_status()
+
+
+async def predict_request(client, mode, ticker='AAPL', poll_interval=0.25, wait=30):
+    if mode == 'asgi':
+        response = await client.post('/api/v1/async/predict/', json={'ticker': ticker, 'wait': wait})
+        response.raise_for_status()
+        return
+    response = await client.post('/api/v1/predict/', json={'ticker': ticker})
+    response.raise_for_status()
+    status_url = response.json()['status_url']
+    while True:
+        job = (await client.get(status_url)).json()
+        if job['status'] in ('succeeded', 'failed'):
+            return
+        await asyncio.sleep(poll_interval)
+
+
+SCENARIOS = {'list': list_request, 'predict': predict_request}
+
+
+async def run_clients(port, mode, token, scenario, clients, duration):
+    request = SCENARIOS[scenario]
+    latencies, errors = [], 0
+    headers = {'Authorization': f'Bearer {token}'}
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', headers=headers,
+                                 limits=limits, timeout=120) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    await request(client, mode)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values[0] if values else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS, default='list')
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=3, help='Worker processes for each server')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of load per server')
+    parser.add_argument('--seed-predictions', type=int, default=50,
+                        help='Stored predictions returned by each list request')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    token = benchmark_token(args.seed_predictions)
+
+    print(f"{args.scenario}: {args.clients} clients, {args.workers} workers, {args.duration:.0f} s per server")
+    print(f"{'server':<8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for mode, (port, command) in server_commands(args.workers).items():
+        server = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(port)
+            latencies, errors, elapsed = asyncio.run(
+                run_clients(port, mode, token, args.scenario, args.clients, args.duration)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        ms = [latency * 1000 for latency in latencies]
+        print(f"{mode:<8}{len(latencies) / elapsed:>10.1f}{percentile(ms, 50):>8.0f}ms"
+              f"{percentile(ms, 95):>8.0f}ms{percentile(ms, 99):>8.0f}ms{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
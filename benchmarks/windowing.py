@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for the windowing stage of predict_with_plot.
+
+Compares the original list-of-slices implementation with
+`ml_model.predict_utils.build_windows` on a synthetic ten-year daily history
+and reports wall time and peak allocation per ticker.
+
+    python -m benchmarks.windowing [--rows 2515] [--repeat 50]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from ml_model.predict_utils import build_windows
+
+
+def legacy_windows(df):
+    """The windowing code as it was before build_windows."""
+    train = df.Close[0:int(len(df)*0.7)]
+    test = df.Close[int(len(df)*0.7):]
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    past_100 = train.tail(100)
+    final_df = pd.concat([past_100, test], ignore_index=True)
+    input_data = scaler.fit_transform(final_df.values.reshape(-1, 1))
+
+    x_test, y_test = [], []
+    for i in range(100, len(input_data)):
+        x_test.append(input_data[i-100:i])
+        y_test.append(input_data[i, 0])
+    return np.array(x_test), np.array(y_test)
+
+
+def synthetic_history(rows):
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=rows, name='Date')
+    return pd.DataFrame({'Close': close}, index=index)
+
+
+def measure(fn, df, repeat):
+    fn(df)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(df)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2515, help='Daily bars per ticker (10y is ~2515)')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    df = synthetic_history(args.rows)
+
+    x_old, y_old = legacy_windows(df)
+    x_new, y_new, _, _ = build_windows(df)
+    assert x_old.shape == x_new.shape and y_old.shape == y_new.shape
+    max_diff = float(np.abs(x_old - x_new).max())
+
+    print(f"{len(x_new)} windows of {x_new.shape[1]} steps, max abs diff {max_diff:.2e}")
+    print(f"{'implementation':<16}{'time/ticker':>14}{'peak alloc':>14}")
+    for name, fn in (('legacy', legacy_windows), ('build_windows', build_windows)):
+        elapsed, peak = measure(fn, df, args.repeat)
+        print(f"{name:<16}{elapsed * 1000:>11.3f} ms{peak / 1024:>11.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
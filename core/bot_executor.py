@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+BOT_PREDICTION_WORKERS = config("BOT_PREDICTION_WORKERS", default=4, cast=int)
+
+
+class PredictionExecutor:
+    """
+    Runs blocking bot work (fetch, inference, plotting) on a bounded thread
+    pool so one slow ticker doesn't stall every chat.
+
+    Jobs from the same chat run one at a time in the order they arrived; jobs
+    from different chats run concurrently up to `max_workers`. Threads are
+    enough here: NumPy and Keras release the GIL for the heavy parts, and the
+    threads share the process's loaded model and batching engine.
+    """
+
+    def __init__(self, max_workers=BOT_PREDICTION_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot-predict")
+        self._slots = asyncio.Semaphore(max_workers)
+        self._chat_locks = {}
+        self._waiting = 0
+
+    async def run(self, chat_id, fn, *args, on_queued=None):
+        """
+        Await `fn(*args)` on the pool. If every worker is busy, `on_queued` is
+        awaited first with the job's 1-based position in the queue.
+        """
+        entry = self._chat_locks.get(chat_id)
+        if entry is None:
+            entry = self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if self._slots.locked() and on_queued is not None:
+                    await on_queued(self._waiting + 1)
+                self._waiting += 1
+                try:
+                    await self._slots.acquire()
+                finally:
+                    self._waiting -= 1
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self._pool, self._call, fn, args)
+                finally:
+                    self._slots.release()
+        finally:
+            # Forget the chat once nothing of it is pending
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat_id]
+
+    @staticmethod
+    def _call(fn, args):
+        # Pool threads keep their own DB connections; drop ones that went stale between jobs
+        close_old_connections()
+        return fn(*args)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
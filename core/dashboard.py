@@ -0,0 +1,147 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from api.models import StockPrediction, UserProfile
+
+DASHBOARD_PAGE_SIZE = 10
+# Upper bound on staleness if an invalidation is ever missed
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def count_key(user_id):
+    return f"dashboard:count:{user_id}"
+
+
+def version_key(user_id):
+    return f"dashboard:version:{user_id}"
+
+
+def pro_key(user_id):
+    return f"dashboard:is_pro:{user_id}"
+
+
+def is_pro(user_id):
+    """Whether the user has a premium account, cached until their profile is saved."""
+    pro = cache.get(pro_key(user_id))
+    if pro is None:
+        # Profiles are created with the user (api.signals); users older than that read as free
+        pro = UserProfile.objects.filter(user_id=user_id).values_list('is_pro', flat=True).first() or False
+        cache.set(pro_key(user_id), pro, DASHBOARD_CACHE_TIMEOUT)
+    return pro
+
+
+def invalidate_profile(user_id):
+    cache.delete(pro_key(user_id))
+
+
+def prediction_count(user_id):
+    """Number of predictions of the user, cached until one is added or removed."""
+    count = cache.get(count_key(user_id))
+    if count is None:
+        count = StockPrediction.objects.filter(user_id=user_id).count()
+        cache.set(count_key(user_id), count, DASHBOARD_CACHE_TIMEOUT)
+    return count
+
+
+def history_version(user_id):
+    """Token that changes whenever the user's history does; part of the fragment cache key."""
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        cache.set(version_key(user_id), version, DASHBOARD_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_history(user_id):
+    cache.delete(count_key(user_id))
+    cache.set(version_key(user_id), time.time_ns(), DASHBOARD_CACHE_TIMEOUT)
+
+
+def encode_cursor(prediction):
+    return f"{(prediction.created_at - EPOCH) // timedelta(microseconds=1)}-{prediction.pk}"
+
+
+def decode_cursor(cursor):
+    """`(created_at, id)` from a cursor, or None if it is malformed."""
+    try:
+        micros, pk = (int(part) for part in cursor.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=micros), pk
+
+
+class KeysetPage:
+    """
+    One page of a user's predictions, newest first, positioned by the
+    (created_at, id) of the row before or after it instead of an offset.
+
+    Rows are fetched on first use, so a page rendered inside a cached template
+    fragment costs no query when the fragment is served from the cache.
+    """
+
+    def __init__(self, user_id, before=None, after=None, size=DASHBOARD_PAGE_SIZE):
+        self.user_id = user_id
+        self.before = decode_cursor(before) if before else None
+        self.after = decode_cursor(after) if after and not self.before else None
+        self.size = size
+        if self.before:
+            self.cache_key = f"before:{before}"
+        elif self.after:
+            self.cache_key = f"after:{after}"
+        else:
+            self.cache_key = "first"
+
+    @cached_property
+    def _fetched(self):
+        queryset = StockPrediction.objects.filter(user_id=self.user_id)
+        if self.after:
+            created_at, pk = self.after
+            rows = list(
+                queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+                .order_by('created_at', 'id')[:self.size + 1]
+            )
+            more = len(rows) > self.size
+            return rows[:self.size][::-1], more
+        if self.before:
+            created_at, pk = self.before
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(queryset.order_by('-created_at', '-id')[:self.size + 1])
+        return rows[:self.size], len(rows) > self.size
+
+    @property
+    def rows(self):
+        return self._fetched[0]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def has_previous(self):
+        """Whether newer predictions exist."""
+        if self.after:
+            return self._fetched[1]
+        return self.before is not None
+
+    @property
+    def has_next(self):
+        """Whether older predictions exist."""
+        if self.after:
+            return True
+        return self._fetched[1]
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.rows[0]) if self.rows else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.rows[-1]) if self.rows else None
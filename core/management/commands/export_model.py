@@ -0,0 +1,38 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_model.numpy_runtime import NumpyModel, export_weights
+from ml_model.registry import DEFAULT_NUMPY_MODEL_PATH, MODEL_PATH, WINDOW_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Export the Keras model weights for the pure-NumPy inference backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', type=str, default=MODEL_PATH, help='Keras model file to export')
+        parser.add_argument('--output', type=str, default=DEFAULT_NUMPY_MODEL_PATH, help='Destination .npz file')
+        parser.add_argument('--verify', type=int, default=256,
+                            help='Compare NumPy and Keras outputs on this many random windows (0 to skip)')
+        parser.add_argument('--tolerance', type=float, default=1e-4, help='Maximum allowed absolute difference')
+
+    def handle(self, *args, **kwargs):
+        from keras.models import load_model
+
+        model = load_model(kwargs['source'])
+        export_weights(model, kwargs['output'])
+        self.stdout.write(f"Exported {kwargs['source']} to {kwargs['output']}")
+
+        if not kwargs['verify']:
+            return
+
+        # Random scaled windows plus a smooth ramp, both in the [0, 1] range the model is fed
+        rng = np.random.default_rng(0)
+        x = rng.random((kwargs['verify'], WINDOW_SIZE, 1), dtype=np.float32)
+        x[0, :, 0] = np.linspace(0, 1, WINDOW_SIZE, dtype=np.float32)
+
+        expected = model.predict(x, verbose=0)
+        actual = NumpyModel(kwargs['output']).predict(x)
+        max_diff = float(np.abs(expected - actual).max())
+        if max_diff > kwargs['tolerance']:
+            raise CommandError(f"NumPy runtime differs from Keras by {max_diff:.2e} (tolerance {kwargs['tolerance']:.0e})")
+        self.stdout.write(self.style.SUCCESS(f"Parity check passed on {len(x)} windows, max abs diff {max_diff:.2e}"))
@@ -0,0 +1,131 @@
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import httpx
+from django.core.management.base import BaseCommand
+
+from core.telegram_webhook import TELEGRAM_WEBHOOK_SECRET
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Stock Insight', 'username': 'fake_stock_insight_bot'}
+
+
+class FakeBotAPI:
+    """Just enough of the Bot API for the stock_insight bot to run against."""
+
+    def __init__(self, log):
+        self.log = log
+        self.ids = itertools.count(1)
+
+    def message(self, params, **fields):
+        chat_id = params.get('chat_id', 0)
+        return {'message_id': next(self.ids), 'date': int(time.time()), 'from': BOT_USER,
+                'chat': {'id': int(chat_id), 'type': 'private'}, **fields}
+
+    def photo(self):
+        file_id = f'fake-photo-{next(self.ids)}'
+        return [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1200, 'height': 600}]
+
+    def call(self, method, params):
+        self.log(f"{method} {json.dumps(params, default=str)[:300]}")
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            time.sleep(1)  # pretend to long-poll
+            return []
+        if method == 'sendMessage':
+            return self.message(params, text=params.get('text', ''))
+        if method == 'sendPhoto':
+            return self.message(params, photo=self.photo())
+        if method == 'sendMediaGroup':
+            media = json.loads(params.get('media', '[]'))
+            return [self.message(params, photo=self.photo()) for _ in media]
+        return True
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            # Paths look like /bot<token>/<method>
+            method = self.path.rstrip('/').rsplit('/', 1)[-1]
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            content_type = self.headers.get('Content-Type', '')
+            if content_type.startswith('application/json'):
+                params = json.loads(body or b'{}')
+            elif content_type.startswith('application/x-www-form-urlencoded'):
+                params = dict(parse_qsl(body.decode()))
+            else:
+                params = {'upload': f'{len(body)} bytes'}
+                # Multipart uploads: pull the plain fields out without a full parser
+                for part in body.split(b'\r\n--'):
+                    head, _, value = part.partition(b'\r\n\r\n')
+                    if b'filename=' not in head and b'name="' in head:
+                        name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+                        params[name] = value.rstrip(b'\r\n').decode(errors='replace')
+
+            payload = json.dumps({'ok': True, 'result': api.call(method, params)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Run a fake Telegram Bot API server and optionally push messages to the bot webhook'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8081,
+                            help='Port to serve on; point the bot at it with TELEGRAM_API_URL=http://127.0.0.1:PORT')
+        parser.add_argument('--webhook-url', help='Bot webhook to POST the --send messages to')
+        parser.add_argument('--send', action='append', default=[], metavar='TEXT',
+                            help='Message text to deliver as an update, e.g. "/predict AAPL"; repeatable')
+        parser.add_argument('--chat-id', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=0,
+                            help='Stop after this many seconds (default: run until interrupted)')
+
+    def handle(self, *args, **kwargs):
+        api = FakeBotAPI(log=self.stdout.write)
+        server = ThreadingHTTPServer(('127.0.0.1', kwargs['port']), make_handler(api))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(self.style.SUCCESS(f"Fake Telegram Bot API on http://127.0.0.1:{kwargs['port']}"))
+
+        try:
+            for update_id, text in enumerate(kwargs['send'], start=1):
+                response = httpx.post(
+                    kwargs['webhook_url'],
+                    json=self.update(update_id, text, kwargs['chat_id']),
+                    headers={'X-Telegram-Bot-Api-Secret-Token': TELEGRAM_WEBHOOK_SECRET},
+                )
+                self.stdout.write(f"update {update_id} {text!r} -> HTTP {response.status_code}")
+
+            deadline = time.monotonic() + kwargs['duration'] if kwargs['duration'] else None
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+
+    @staticmethod
+    def update(update_id, text, chat_id):
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test', 'username': 'tester'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': update_id, 'message': message}
@@ -0,0 +1,120 @@
+import os
+import re
+import time
+
+from decouple import config
+from django.core.management.base import BaseCommand
+
+from api.models import StockPrediction
+from ml_model.cache import PREDICTION_CACHE_TTL
+from ml_model.predict_utils import MEDIA_DIR, plot_dir
+
+MEDIA_RETENTION_DAYS = config('MEDIA_RETENTION_DAYS', default=30, cast=int)
+
+SHARD_RE = re.compile(r'^[0-9a-f]{2}$')
+LEGACY_DIR_RE = re.compile(r'^(?P<ticker>.+)_(?P<timestamp>\d{8}_\d{6})$')
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced or expired plot and series files from the media directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=MEDIA_RETENTION_DAYS,
+                            help='Delete plots older than this even if a prediction still references them')
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Never touch files younger than this, they may still be in flight. '
+                                 'Raised to PREDICTION_CACHE_TTL if shorter')
+        parser.add_argument('--reshard', action='store_true',
+                            help='Move legacy media/<ticker>_<timestamp>/ directories into hashed shards')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and collect every INTERVAL seconds')
+
+    def handle(self, *args, **kwargs):
+        while True:
+            if kwargs['reshard']:
+                self.reshard(kwargs['dry_run'])
+            self.collect(kwargs['retention_days'], kwargs['grace_minutes'], kwargs['dry_run'])
+            if not kwargs['interval']:
+                break
+            time.sleep(kwargs['interval'])
+
+    def referenced_paths(self):
+        referenced = set()
+        for urls, series_path in StockPrediction.objects.values_list('plot_urls', 'series_path').iterator():
+            referenced.update(os.path.normpath(url) for url in urls or [])
+            if series_path:
+                referenced.add(os.path.normpath(series_path))
+        return referenced
+
+    def collect(self, retention_days, grace_minutes, dry_run):
+        now = time.time()
+        # Prediction cache entries (e.g. from prewarm) point at files no row references
+        # yet; they are only read until the entry expires
+        grace_cutoff = now - max(grace_minutes * 60, PREDICTION_CACHE_TTL)
+        retention_cutoff = now - retention_days * 24 * 60 * 60
+        # References are read after `now`, so files of predictions saved later are still inside the grace window
+        referenced = self.referenced_paths()
+
+        deleted, reclaimed = 0, 0
+        for root, dirs, files in os.walk(MEDIA_DIR, topdown=False):
+            for name in files:
+                path = os.path.normpath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > grace_cutoff:
+                    continue
+                if path in referenced and stat.st_mtime > retention_cutoff:
+                    continue
+                if not dry_run:
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                deleted += 1
+                reclaimed += stat.st_size
+
+            if root != os.path.normpath(MEDIA_DIR) and not dry_run:
+                try:
+                    if os.stat(root).st_mtime <= grace_cutoff:
+                        os.rmdir(root)  # only succeeds when empty
+                except OSError:
+                    pass
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} file(s), reclaimed {reclaimed / (1024 * 1024):.2f} MiB from {MEDIA_DIR}"
+        ))
+        return deleted, reclaimed
+
+    def reshard(self, dry_run):
+        moves = {}
+        for name in os.listdir(MEDIA_DIR) if os.path.isdir(MEDIA_DIR) else []:
+            match = LEGACY_DIR_RE.match(name)
+            if SHARD_RE.match(name) or not match or not os.path.isdir(os.path.join(MEDIA_DIR, name)):
+                continue
+            source = os.path.normpath(os.path.join(MEDIA_DIR, name))
+            moves[source] = os.path.normpath(plot_dir(match['ticker'], match['timestamp']))
+
+        if not dry_run:
+            for source, target in moves.items():
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.rename(source, target)
+
+            # Point existing predictions at the moved files
+            for prediction in StockPrediction.objects.only('id', 'plot_urls').iterator():
+                urls = [self.moved_url(url, moves) for url in prediction.plot_urls or []]
+                if urls != prediction.plot_urls:
+                    StockPrediction.objects.filter(pk=prediction.pk).update(plot_urls=urls)
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(f"{verb} {len(moves)} legacy plot directories into shards")
+
+    @staticmethod
+    def moved_url(url, moves):
+        directory, name = os.path.split(os.path.normpath(url))
+        if directory in moves:
+            return f"{moves[directory]}/{name}"
+        return url
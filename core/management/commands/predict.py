@@ -1,7 +1,15 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from ml_model.predict_utils import predict_with_plot, fetch_ohlcv_data
+from django.db import connections
 from api.models import StockPrediction
+from api.worker import init_worker, predict_tickers
+from core.dashboard import invalidate_history
+from ml_model.store import TICKER_RE, store
 from django.contrib.auth.models import User
 
 class Command(BaseCommand):
@@ -9,47 +17,118 @@ class Command(BaseCommand):
     def bold_text(self, text):
         """Helper method to make text bold using ANSI codes"""
         return f"\033[1m{text}\033[0m"
-    
+
     def add_arguments(self, parser):
         parser.add_argument('--ticker', type=str, help='Stock ticker symbol')
-        parser.add_argument('--all', action='store_true', help='Predict for all stocks in the database')
-    
+        parser.add_argument('--all', action='store_true', help='Refresh predictions for every ticker in the database')
+        parser.add_argument('--tickers-file', help='Refresh predictions for the tickers in this file, one per line')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes for inference and plotting')
+        parser.add_argument('--chunk-size', type=int, default=16,
+                            help='Tickers per worker task; their forward passes are batched together')
+        parser.add_argument('--download-batch', type=int, default=100,
+                            help='Tickers per upstream download request')
+
     def handle(self, *args, **kwargs):
-        # Import the predict function from the telegrambot module
-        tickers = []
-        
         admin_user = User.objects.filter(is_superuser=True).first()
         if not admin_user:
             self.stdout.write(self.style.ERROR("No superuser found. Please create a superuser first."))
             return
-        
+
+        tickers = self.resolve_tickers(kwargs)
+        if not tickers:
+            self.stdout.write(self.style.ERROR("Please provide a ticker symbol, --tickers-file or use --all to predict for all stocks."))
+            return
+
+        invalid = [ticker for ticker in tickers if not TICKER_RE.match(ticker)]
+        tickers = [ticker for ticker in tickers if TICKER_RE.match(ticker)]
+        for ticker in invalid:
+            self.stdout.write(self.style.WARNING(f"Skipping invalid ticker: {ticker}"))
+
+        started = time.perf_counter()
+        self.download(tickers, kwargs['download_batch'])
+        downloaded = time.perf_counter()
+
+        results = self.predict(tickers, kwargs['processes'], kwargs['chunk_size'])
+        predicted = time.perf_counter()
+
+        rows, failed = [], []
+        for ticker, prediction, error in results:
+            if prediction is None:
+                failed.append(ticker)
+                self.stdout.write(self.style.ERROR(f"Prediction failed for {ticker}: {error}"))
+                continue
+            rows.append(StockPrediction(
+                stock_symbol=ticker,
+                user=admin_user,
+                next_day_price=prediction['next_day_price'],
+                metrics_json=prediction['metrics'],
+                plot_urls=prediction['plot_urls'],
+                plot_status=prediction['plot_status'],
+                series_path=prediction['series_path'],
+            ))
+            if len(tickers) == 1 or kwargs['verbosity'] > 1:
+                self.stdout.write(self.bold_text(f"{ticker}: next day price prediction: {prediction['next_day_price']}"))
+
+        StockPrediction.objects.bulk_create(rows)
+        # bulk_create sends no post_save, so drop the cached dashboard history here
+        invalidate_history(admin_user.id)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Predicted {len(rows)}/{len(tickers)} tickers in {elapsed:.1f} s "
+            f"(download {downloaded - started:.1f} s, inference and plots {predicted - downloaded:.1f} s, "
+            f"{len(tickers) / elapsed:.1f} tickers/s)"
+        ))
+        if failed:
+            raise CommandError(f"{len(failed)} ticker(s) failed: {', '.join(failed)}")
+
+    def resolve_tickers(self, kwargs):
         if kwargs['ticker']:
-            tickers = [kwargs['ticker'].upper()]
-            
-            df = fetch_ohlcv_data(tickers[0])
-            if df is None:
-                self.stdout.write(self.style.ERROR(f"Failed to fetch data for ticker: {tickers[0]}"))
-                return
-            prediction = predict_with_plot(df, tickers[0])
-            
-            if prediction:
-                StockPrediction.objects.create(
-                    stock_symbol=tickers[0],
-                    user = admin_user,
-                    next_day_price=prediction['next_day_price'],
-                    metrics_json=prediction['metrics'],
-                    plot_urls=prediction['plot_urls']
+            return [kwargs['ticker'].upper()]
+        if kwargs['tickers_file']:
+            with open(kwargs['tickers_file']) as f:
+                lines = (line.split('#', 1)[0].strip().upper() for line in f)
+                return list(dict.fromkeys(line for line in lines if line))
+        if kwargs['all']:
+            # Rows saved before tickers were normalised may be lowercase
+            symbols = StockPrediction.objects.values_list('stock_symbol', flat=True).distinct()
+            return sorted({symbol.strip().upper() for symbol in symbols})
+        return []
+
+    def download(self, tickers, batch_size):
+        """Refresh the stored history of all tickers in a few multi-ticker downloads."""
+        refreshed = 0
+        for start in range(0, len(tickers), batch_size):
+            batch = tickers[start:start + batch_size]
+            try:
+                refreshed += store.refresh_many(batch)
+            except Exception as e:
+                # Each ticker is retried on its own when it is read
+                self.stdout.write(self.style.WARNING(f"Bulk download failed for {len(batch)} ticker(s): {e}"))
+        self.stdout.write(f"Refreshed history of {refreshed} ticker(s), {len(tickers) - refreshed} already fresh")
+
+    def predict(self, tickers, processes, chunk_size):
+        chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+        processes = min(processes, len(chunks))
+        if processes <= 1:
+            return [result for chunk in chunks for result in predict_tickers(chunk)]
+
+        # Children get their own connections; spawn avoids inheriting this process's threads and sockets
+        connections.close_all()
+        results, started = [], time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        ) as pool:
+            futures = [pool.submit(predict_tickers, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                results.extend(future.result())
+                done = len(results)
+                rate = done / (time.perf_counter() - started)
+                self.stdout.write(
+                    f"[{done:>{len(str(len(tickers)))}}/{len(tickers)}] {rate:.1f} tickers/s, "
+                    f"eta {(len(tickers) - done) / rate:.0f} s"
                 )
-                self.stdout.write(self.style.SUCCESS(f"Prediction completed for {tickers[0]}"))
-                self.stdout.write(self.bold_text(f"Next day price prediction: {prediction['next_day_price']}"))
-            else:
-                self.stdout.write(self.style.ERROR(f"Prediction failed for {tickers[0]}"))
-            
-        elif kwargs['all']:
-            all_predictions = StockPrediction.objects.filter(user=admin_user)
-            
-            for prediction in all_predictions:
-                self.stdout.write(self.bold_text(f"Stock: {prediction.stock_symbol}, Next Day Prediction: {prediction.next_day_price}"))
-                
-        else:
-            self.stdout.write(self.style.ERROR("Please provide a ticker symbol or use --all to predict for all stocks."))
\ No newline at end of file
+        return results
@@ -0,0 +1,116 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from decouple import config
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import claim_next_job, fail_jobs, requeue_stale_jobs
+from api.singleflight import purge_leases
+from api.worker import init_worker, run_jobs
+
+PREDICTION_WORKER_PROCESSES = config('PREDICTION_WORKER_PROCESSES', default=2, cast=int)
+# Jobs each process runs at once; together they share forward passes through ml_model.batching
+PREDICTION_WORKER_THREADS = config('PREDICTION_WORKER_THREADS', default=4, cast=int)
+
+
+class Command(BaseCommand):
+    help = 'Run queued prediction jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=PREDICTION_WORKER_PROCESSES,
+                            help='Number of worker processes')
+        parser.add_argument('--threads', type=int, default=PREDICTION_WORKER_THREADS,
+                            help='Jobs each process runs at once, on threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before checking an empty queue again')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue jobs that have been running for longer than this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def start_pool(self, processes):
+        # Children get their own connections; spawn avoids inheriting this process's threads and sockets
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+
+    def claim_jobs(self, limit):
+        job_ids = []
+        while len(job_ids) < limit:
+            job_id = claim_next_job()
+            if job_id is None:
+                break
+            job_ids.append(job_id)
+        return job_ids
+
+    def handle(self, *args, **kwargs):
+        processes = kwargs['processes']
+        threads = kwargs['threads']
+        poll_interval = kwargs['poll_interval']
+
+        requeued = requeue_stale_jobs(kwargs['stale_after'])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        pool = self.start_pool(processes)
+        self.stdout.write(self.style.SUCCESS(
+            f"Prediction worker started with {processes} process(es) of {threads} thread(s)"
+        ))
+
+        # Each future runs a batch of up to `threads` jobs in one process
+        in_flight = {}
+        last_requeue = time.monotonic()
+        try:
+            while True:
+                lost = []
+                # Keep every process busy, but don't claim jobs nobody can start yet
+                while len(in_flight) < processes:
+                    job_ids = self.claim_jobs(threads)
+                    if not job_ids:
+                        break
+                    try:
+                        in_flight[pool.submit(run_jobs, job_ids)] = job_ids
+                    except BrokenProcessPool:
+                        lost += job_ids
+                        break
+
+                if not in_flight and not lost:
+                    if kwargs['once']:
+                        break
+                    time.sleep(poll_interval)
+                elif in_flight:
+                    done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_ids = in_flight.pop(future)
+                        try:
+                            for job_id, status in zip(job_ids, future.result()):
+                                self.stdout.write(f"Job {job_id}: {status}")
+                        except BrokenProcessPool:
+                            lost += job_ids
+                        except Exception as e:
+                            self.stdout.write(self.style.ERROR(f"Jobs {job_ids} crashed: {e}"))
+                            fail_jobs(job_ids, str(e))
+
+                if lost:
+                    # A process died, e.g. killed for memory; every job still in the pool is gone with it
+                    for job_ids in in_flight.values():
+                        lost += job_ids
+                    in_flight.clear()
+                    fail_jobs(lost, 'The prediction worker process crashed')
+                    self.stdout.write(self.style.ERROR(
+                        f"Worker process crashed, failed job(s) {lost}; restarting the pool"
+                    ))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.start_pool(processes)
+
+                if time.monotonic() - last_requeue > kwargs['stale_after']:
+                    requeue_stale_jobs(kwargs['stale_after'])
+                    purge_leases()
+                    last_requeue = time.monotonic()
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime, timedelta
+
+from decouple import config
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from api.models import StockPrediction
+from api.worker import predict_tickers
+from ml_model.cache import PREDICTION_CACHE_BACKEND
+from ml_model.store import TICKER_RE, store
+
+PREWARM_TOP_N = config('PREWARM_TOP_N', default=50, cast=int)
+PREWARM_TIME_BUDGET = config('PREWARM_TIME_BUDGET', default=15 * 60, cast=int)
+
+
+def popular_tickers(top, days):
+    """The `top` tickers with the most predictions in the last `days` days, most requested first."""
+    since = timezone.now() - timedelta(days=days)
+    return [
+        row['symbol']
+        # Rows saved before tickers were normalised may be lowercase; count them with the rest
+        for row in StockPrediction.objects.filter(created_at__gte=since)
+        .annotate(symbol=Upper('stock_symbol'))
+        .values('symbol')
+        .annotate(requests=Count('id'))
+        .order_by('-requests', 'symbol')[:top]
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Precompute predictions and plots for the most requested tickers so peak-hour requests hit the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=PREWARM_TOP_N, help='Number of tickers to warm')
+        parser.add_argument('--days', type=int, default=7, help='Rank tickers by requests over this many days')
+        parser.add_argument('--budget', type=int, default=PREWARM_TIME_BUDGET,
+                            help='Stop starting new tickers after this many seconds')
+        parser.add_argument('--chunk-size', type=int, default=8,
+                            help='Tickers predicted together; their forward passes are batched')
+        parser.add_argument('--at', metavar='HH:MM',
+                            help='Keep running and warm every day at this server time (e.g. before market open)')
+
+    def handle(self, *args, **kwargs):
+        if PREDICTION_CACHE_BACKEND.endswith('LocMemBackend'):
+            self.stdout.write(self.style.WARNING(
+                'PREDICTION_CACHE_BACKEND is per-process; only the market data, inference state '
+                'and plots warmed here are shared with the web and bot processes'
+            ))
+
+        if not kwargs['at']:
+            self.warm(kwargs)
+            return
+
+        try:
+            at = datetime.strptime(kwargs['at'], '%H:%M').time()
+        except ValueError:
+            raise CommandError('--at must look like HH:MM')
+        while True:
+            now = timezone.localtime()
+            next_run = now.replace(hour=at.hour, minute=at.minute, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            self.stdout.write(f"Next prewarm at {next_run:%Y-%m-%d %H:%M %Z}")
+            time.sleep((next_run - now).total_seconds())
+            self.warm(kwargs)
+
+    def warm(self, kwargs):
+        started = time.monotonic()
+        deadline = started + kwargs['budget']
+        tickers = [ticker for ticker in popular_tickers(kwargs['top'], kwargs['days']) if TICKER_RE.match(ticker)]
+        if not tickers:
+            self.stdout.write('No recent predictions to rank tickers by')
+            return
+
+        try:
+            store.refresh_many(tickers)
+        except Exception as e:
+            # Each ticker is retried on its own when it is read
+            self.stdout.write(self.style.WARNING(f"Bulk download failed: {e}"))
+
+        warmed, failed = 0, 0
+        for start in range(0, len(tickers), kwargs['chunk_size']):
+            if time.monotonic() >= deadline:
+                self.stdout.write(self.style.WARNING(
+                    f"Time budget of {kwargs['budget']} s used up, skipped {len(tickers) - start} ticker(s)"
+                ))
+                break
+            for ticker, result, error in predict_tickers(tickers[start:start + kwargs['chunk_size']]):
+                if result is None:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"Could not warm {ticker}: {error}"))
+                else:
+                    warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {warmed}/{len(tickers)} popular ticker(s) in {time.monotonic() - started:.1f} s, {failed} failed"
+        ))
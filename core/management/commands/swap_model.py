@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_model.registry import ModelRegistry, registry
+
+
+class Command(BaseCommand):
+    help = 'Validate a model file and atomically install it as the serving model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Path to the new model file (.keras, or .npz for the numpy backend)')
+
+    def handle(self, *args, **kwargs):
+        source = kwargs['path']
+        if not os.path.exists(source):
+            raise CommandError(f"Model file not found: {source}")
+
+        # Build and warm up the candidate before it goes anywhere near the serving path
+        candidate = ModelRegistry(path=source, backend=registry.backend, reload_interval=0).load()
+        self.stdout.write(f"Validated {source} (version {candidate.version})")
+
+        # Copy next to the target and rename over it, so readers never see a partial file.
+        # Running workers notice the new mtime and swap the model in on their next request.
+        target = registry.path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=os.path.splitext(target)[1])
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(f"Installed model version {candidate.version} at {target}"))
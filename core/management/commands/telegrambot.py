@@ -1,8 +1,9 @@
+import asyncio
 import logging
 
-from telegram import ForceReply, Update, InputFile, InputMediaPhoto
+from telegram import ForceReply, Update, InputFile
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from decouple import config
 
@@ -10,18 +11,34 @@ from asgiref.sync import sync_to_async
 
 # Load DB Models
 from api.models import TelegramUser, StockPrediction
+from api.quota import DAILY_FREE_PREDICTIONS, consume_quota
 from django.contrib.auth.models import User
 
 # ML models utility functions
-from ml_model.predict_utils import fetch_ohlcv_data, predict_with_plot
+from ml_model.registry import preload
 
-# Subscription handler
-import stripe
+# Bounded pool for predictions, so one slow ticker doesn't block other chats
+from core.bot_executor import PredictionExecutor
+
+# Plot uploads, reusing Telegram file_ids of plots sent before
+from core.telegram_media import send_photos
+
+# Webhook mode, where updates arrive through the web app instead of polling
+from core.telegram_webhook import TELEGRAM_WEBHOOK_SECRET
 
-# Set up Stripe
-stripe.api_key = config("STRIPE_SECRET_KEY")
+# Per-stage timings of each prediction, logged for capacity planning
+from stock_insight.metrics import collect, format_timings
+
+# Subscription handler
+def get_stripe():
+    """Import stripe on first use; importing it adds about a second to startup."""
+    import stripe
+    stripe.api_key = config("STRIPE_SECRET_KEY")
+    return stripe
 
 BOT_TOKEN = config("BOT_TOKEN")
+# Point the bot at another Bot API server, e.g. `manage.py fake_telegram` in tests
+TELEGRAM_API_URL = config("TELEGRAM_API_URL", default="https://api.telegram.org")
 
 # Enable logging
 logging.basicConfig(
@@ -49,26 +66,21 @@ def get_or_create_telegram_user(user, chat_id, username):
     )
     return tg_user, created
 
-@sync_to_async
+prediction_executor = PredictionExecutor()
+
 def get_prediction(ticker, chat):
     """Fetch stock prediction for a given ticker."""
+    from api.services import NoDataError, create_prediction
+
     try:
-        df = fetch_ohlcv_data(ticker)
-        if df.empty:
-            return None, "No data found for the ticker."
-        prediction = predict_with_plot(df, ticker)
-        if prediction is None:
-            return None, "Prediction failed."
-        # Save the prediction to the database
-        stock_prediction = StockPrediction.objects.create(
-            stock_symbol=ticker,
-            user=User.objects.filter(username = chat.id).first(),  
-            next_day_price=prediction['next_day_price'],
-            metrics_json=prediction['metrics'],
-            plot_urls=prediction['plot_urls']
-        )
-        print(stock_prediction)
+        user = User.objects.filter(username=chat.id).first()
+        # Shares the computation with API requests for the same ticker in flight
+        with collect() as timings:
+            _, stock_prediction = create_prediction(user, ticker)
+        logger.info(f"Prediction for {ticker} in chat {chat.id}: {format_timings(timings) or 'shared result'}")
         return stock_prediction, None
+    except NoDataError:
+        return None, "No data found for the ticker."
     except Exception as e:
         logger.error(f"Error fetching prediction for {ticker}: {e}")
         return None, str(e)
@@ -86,22 +98,13 @@ def get_latest_predictions(chat):
 @sync_to_async
 def rate_limiter(user, chat_id, username, message):
     """Rate limiting logic to restrict daily requests."""
-    telegram_user, created = TelegramUser.objects.get_or_create(
+    # Same atomic quota check the API uses, against the Telegram user's row
+    return consume_quota(
+        TelegramUser,
+        today=message.date.date(),
+        defaults={'username': username, 'user': user},
         chat_id=chat_id,
-        defaults={'username': username, 'user': user}
-    )
-    # Increment daily request count
-    if telegram_user.last_request_date != message.date.date():
-        telegram_user.daily_request_count = 0
-        telegram_user.last_request_date = message.date.date()
-    
-    if telegram_user.daily_request_count >= 5 and not telegram_user.is_pro:
-        return None
-        
-    # Update last request date
-    telegram_user.daily_request_count += 1
-    telegram_user.save()
-    return telegram_user.daily_request_count
+    ) or None
 
 @sync_to_async
 def get_checkout_session(chat):
@@ -143,7 +146,7 @@ async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         
         if status is None:
             await update.message.reply_text(
-                "You have reached your daily limit of 5 predictions. Please try again tomorrow.\n"
+                f"You have reached your daily limit of {DAILY_FREE_PREDICTIONS} predictions. Please try again tomorrow.\n"
                 "Or /subscribe to get unlimited access."
             )
             return
@@ -153,19 +156,22 @@ async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             f"Fetching prediction for ticker: {ticker}...\n"
             "This feature is under development."
         )
-        stock_prediction, error = await get_prediction(ticker, chat)
-        
+        async def on_queued(position):
+            await update.message.reply_text(f"All workers are busy. Queued, position {position}.")
+
+        stock_prediction, error = await prediction_executor.run(chat.id, get_prediction, ticker, chat, on_queued=on_queued)
+        if stock_prediction is None:
+            await update.message.reply_text(f"Prediction for {ticker} failed: {error}")
+            return
+
         await update.message.reply_text(f"Prediction for {ticker}:\n"
-            f"Next Day Price: {round(stock_prediction.next_day_price, 2) if stock_prediction else 'N/A'}\n"
-            f"Plot URLs: {', '.join(stock_prediction.plot_urls) if stock_prediction else 'N/A'}\n"
-        )
-        photos = [
-            InputMediaPhoto(media=open(url, 'rb'))
-            for url in stock_prediction.plot_urls
-        ]
-        await update.message.reply_media_group(
-            media=photos,
+            f"Next Day Price: {round(stock_prediction.next_day_price, 2)}\n"
+            f"Plot URLs: {', '.join(stock_prediction.plot_urls)}\n"
         )
+        if stock_prediction.plot_urls:
+            await send_photos(update.message, stock_prediction.plot_urls)
+        else:
+            await update.message.reply_text("The charts could not be drawn this time.")
     else:
         await update.message.reply_text(
             "Please provide a stock ticker symbol. Usage: /predict TICKER"
@@ -190,7 +196,7 @@ async def latest_predictions(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def subscription_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle subscription requests."""
     chat = update.effective_chat
-    checkout_session = stripe.checkout.Session.create(
+    checkout_session = get_stripe().checkout.Session.create(
         payment_method_types=['card'],
         line_items=[
             {
@@ -242,10 +248,18 @@ async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(update.message.text)
 
 
-def main() -> None:
-    """Start the bot."""
+def build_application() -> Application:
+    """Create the bot Application with all handlers registered."""
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token(str(BOT_TOKEN)).build()
+    # Updates are handled concurrently; predictions are ordered per chat by prediction_executor
+    application = (
+        Application.builder()
+        .token(str(BOT_TOKEN))
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+        .concurrent_updates(True)
+        .build()
+    )
 
     # on different commands - answer in Telegram
     application.add_handler(CommandHandler("start", start))
@@ -256,15 +270,55 @@ def main() -> None:
 
     # on non command i.e message - echo the message on Telegram
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo))
+    return application
+
+
+async def set_webhook(url) -> None:
+    """Tell Telegram to POST updates to `url` (see core.telegram_webhook) instead of waiting for polls."""
+    async with build_application().bot as bot:
+        await bot.set_webhook(url, secret_token=TELEGRAM_WEBHOOK_SECRET or None, allowed_updates=Update.ALL_TYPES)
+
+
+async def delete_webhook() -> None:
+    async with build_application().bot as bot:
+        await bot.delete_webhook()
+
+
+def main() -> None:
+    """Start the bot."""
+    # Load and warm up the model before the first /predict arrives
+    preload()
 
-    # Run the bot until the user presses Ctrl-C
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    application = build_application()
+
+    # Run the bot until the user presses Ctrl-C; this removes any webhook first
+    try:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    finally:
+        prediction_executor.shutdown()
 
 
 class Command(BaseCommand):
     help = "Start the Telegram bot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--set-webhook", metavar="URL",
+                            help="Register URL (the /telegram/webhook/ route) for webhook mode and exit")
+        parser.add_argument("--delete-webhook", action="store_true", help="Unregister the webhook and exit")
+
     def handle(self, *args, **options):
         """Handle the command to start the Telegram bot."""
+        if options["set_webhook"]:
+            if not TELEGRAM_WEBHOOK_SECRET:
+                raise CommandError("Set TELEGRAM_WEBHOOK_SECRET first; the webhook route refuses updates without it")
+            asyncio.run(set_webhook(options["set_webhook"]))
+            self.stdout.write(self.style.SUCCESS(f"Webhook set to {options['set_webhook']}"))
+            return
+        if options["delete_webhook"]:
+            asyncio.run(delete_webhook())
+            self.stdout.write(self.style.SUCCESS("Webhook deleted"))
+            return
+
         logger.info("Starting Telegram bot...")
         main()
-        logger.info("Telegram bot stopped.")
\ No newline at end of file
+        logger.info("Telegram bot stopped.")
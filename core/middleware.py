@@ -0,0 +1,53 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from stock_insight.metrics import collect, observe, stage_totals
+
+SERVER_TIMING_PREFIX = '/api/'
+
+
+def server_timing(timings, total):
+    """Server-Timing header value, durations in ms."""
+    totals = dict(stage_totals(timings), total=total)
+    return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+class ServerTimingMiddleware:
+    """
+    Report the stages timed while handling an API request in a Server-Timing
+    header, and record the whole request as the "api_request" stage. Stages
+    run by the prediction worker aren't part of the request and don't appear.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith(SERVER_TIMING_PREFIX):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with collect() as timings:
+            response = self.get_response(request)
+        return self.finish(response, timings, start)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(SERVER_TIMING_PREFIX):
+            return await self.get_response(request)
+        start = time.perf_counter()
+        with collect() as timings:
+            response = await self.get_response(request)
+        return self.finish(response, timings, start)
+
+    @staticmethod
+    def finish(response, timings, start):
+        total = time.perf_counter() - start
+        observe('api_request', total)
+        response['Server-Timing'] = server_timing(timings, total)
+        return response
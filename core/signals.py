@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models import StockPrediction, UserProfile
+from .dashboard import invalidate_history, invalidate_profile
+
+
+@receiver(post_save, sender=StockPrediction)
+@receiver(post_delete, sender=StockPrediction)
+def invalidate_dashboard_history(sender, instance, **kwargs):
+    # Also on updates: the history table shows the predicted price
+    invalidate_history(instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_dashboard_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
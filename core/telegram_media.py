@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import logging
+from contextlib import ExitStack
+
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+from api.models import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def known_file_ids(digests):
+    rows = TelegramFile.objects.filter(content_hash__in=digests).values_list('content_hash', 'file_id')
+    return {content_hash: file_id async for content_hash, file_id in rows}
+
+
+async def send_photos(message, paths):
+    """
+    Reply to `message` with the PNGs at `paths` as one media group.
+
+    Files Telegram has seen before (same content, from any chat) are sent by
+    their file_id; the rest are uploaded and their file_id remembered.
+    """
+    digests = await asyncio.gather(*(asyncio.to_thread(file_digest, path) for path in paths))
+    file_ids = await known_file_ids(digests)
+    try:
+        return await _send_media_group(message, paths, digests, file_ids)
+    except BadRequest as e:
+        if not file_ids:
+            raise
+        # A remembered file_id was rejected; forget them and upload the bytes
+        logger.warning(f"Cached Telegram file_id rejected, uploading instead: {e}")
+        await TelegramFile.objects.filter(content_hash__in=list(file_ids)).adelete()
+        return await _send_media_group(message, paths, digests, {})
+
+
+async def _send_media_group(message, paths, digests, file_ids):
+    with ExitStack() as stack:
+        media = [
+            InputMediaPhoto(media=file_ids[digest] if digest in file_ids else stack.enter_context(open(path, 'rb')))
+            for path, digest in zip(paths, digests)
+        ]
+        sent = await message.reply_media_group(media=media)
+
+    for digest, sent_message in zip(digests, sent):
+        if digest not in file_ids and sent_message.photo:
+            # The largest size is the one that resends at full resolution
+            await TelegramFile.objects.aupdate_or_create(
+                content_hash=digest, defaults={'file_id': sent_message.photo[-1].file_id}
+            )
+    return sent
@@ -0,0 +1,39 @@
+"""
+Webhook mode for the Telegram bot: Telegram POSTs updates to the
+/telegram/webhook/ route, which hands them to the same python-telegram-bot
+Application the polling command runs. Needs an ASGI server, since the
+Application lives on the worker's event loop between requests.
+"""
+import asyncio
+
+from decouple import config
+
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token; the route is disabled while unset
+TELEGRAM_WEBHOOK_SECRET = config("TELEGRAM_WEBHOOK_SECRET", default="")
+
+_application = None
+_lock = asyncio.Lock()
+
+
+async def get_application():
+    """Build, initialize and start the bot Application once per worker process."""
+    global _application
+    if _application is None:
+        async with _lock:
+            if _application is None:
+                from core.management.commands.telegrambot import build_application
+
+                application = build_application()
+                await application.initialize()
+                # Runs the task that takes updates off update_queue and calls the handlers
+                await application.start()
+                _application = application
+    return _application
+
+
+async def dispatch_update(data):
+    """Queue a webhook payload for the bot's handlers and return without waiting for them."""
+    from telegram import Update
+
+    application = await get_application()
+    await application.update_queue.put(Update.de_json(data, application.bot))
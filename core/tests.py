@@ -1,3 +1,252 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from api.jobs import enqueue_prediction
+from api.models import PredictionJob, StockPrediction, TelegramUser, UserProfile
+from core import telegram_webhook
+from core.management.commands.fake_telegram import Command as FakeTelegram, FakeBotAPI, make_handler
+from stock_insight import metrics
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_repeat_load_only_reads_the_session_and_user(self):
+        StockPrediction.objects.create(stock_symbol='AAPL', user=self.user, next_day_price=1)
+        self.client.get('/')
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/')
+
+        self.assertContains(response, 'AAPL')
+
+    def test_upgrade_to_pro_shows_on_next_load(self):
+        self.assertIs(self.client.get('/').context['is_pro'], False)
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.is_pro = True
+        profile.save()
+
+        self.assertIs(self.client.get('/').context['is_pro'], True)
+
+    def test_new_prediction_shows_on_next_load(self):
+        self.client.get('/')
+
+        StockPrediction.objects.create(stock_symbol='MSFT', user=self.user, next_day_price=1)
+
+        self.assertContains(self.client.get('/'), 'MSFT')
+
+
+class MetricsViewTests(SimpleTestCase):
+    def test_off_without_a_token(self):
+        with mock.patch('core.views.METRICS_TOKEN', ''):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_requires_the_token(self):
+        with mock.patch('core.views.METRICS_TOKEN', 's3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, metrics.METRIC_NAME)
+
+
+class MergedStagesTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, count):
+        path = os.path.join(self.directory, name)
+        buckets = [0] * (len(metrics.BUCKETS) + 1)
+        buckets[0] = count
+        with open(path, 'w') as f:
+            json.dump({'fetch': {'buckets': buckets, 'sum': 0.001 * count, 'count': count}}, f)
+        return path
+
+    def test_files_of_exited_processes_are_dropped(self):
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        host = socket.gethostname()
+        live = self.write(f"{host}-{os.getppid()}.json", 2)
+        dead = self.write(f"{host}-{exited.pid}.json", 5)
+
+        stages = metrics.merged_stages(self.directory)
+
+        self.assertEqual(stages['fetch']['count'], 2)
+        self.assertTrue(os.path.exists(live))
+        self.assertFalse(os.path.exists(dead))
+
+    def test_files_of_other_hosts_are_dropped_once_stale(self):
+        fresh = self.write('other-host-10.json', 3)
+        stale = self.write('other-host-11.json', 7)
+        old = time.time() - metrics.STALE_FLUSHES * metrics.METRICS_FLUSH_INTERVAL - 60
+        os.utime(stale, (old, old))
+
+        stages = metrics.merged_stages(self.directory)
+
+        self.assertEqual(stages['fetch']['count'], 3)
+        self.assertTrue(os.path.exists(fresh))
+        self.assertFalse(os.path.exists(stale))
+
+
+class FakePool:
+    """Stands in for the process pool, running each batch right away in this process."""
+
+    def __init__(self, crash=False):
+        self.crash = crash
+        self.batches = []
+
+    def submit(self, fn, job_ids):
+        self.batches.append(job_ids)
+        future = Future()
+        if self.crash:
+            future.set_exception(BrokenProcessPool('A child process terminated abruptly'))
+        else:
+            future.set_result(fn(job_ids))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class PredictionWorkerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.jobs = [enqueue_prediction(self.user, ticker) for ticker in ('AAPL', 'MSFT', 'GOOG')]
+
+    def run_worker(self, *pools):
+        with mock.patch('core.management.commands.predictionworker.Command.start_pool', side_effect=pools) as start:
+            call_command('predictionworker', once=True, processes=1, threads=2, stdout=StringIO())
+        return start.call_count
+
+    def statuses(self):
+        return [job.status for job in PredictionJob.objects.order_by('id')]
+
+    def test_jobs_run_in_batches_of_threads(self):
+        pool = FakePool()
+        prediction = StockPrediction.objects.create(stock_symbol='AAPL', user=self.user, next_day_price=1)
+
+        with mock.patch('api.jobs.create_prediction', return_value=({'next_day_price': 1}, prediction)):
+            self.run_worker(pool)
+
+        self.assertEqual(pool.batches, [[self.jobs[0].id, self.jobs[1].id], [self.jobs[2].id]])
+        self.assertEqual(self.statuses(), [PredictionJob.SUCCEEDED] * 3)
+
+    def test_crashed_process_fails_its_jobs_and_restarts_the_pool(self):
+        crashed, fresh = FakePool(crash=True), FakePool()
+        prediction = StockPrediction.objects.create(stock_symbol='GOOG', user=self.user, next_day_price=1)
+
+        with mock.patch('api.jobs.create_prediction', return_value=({'next_day_price': 1}, prediction)):
+            starts = self.run_worker(crashed, fresh)
+
+        self.assertEqual(starts, 2)
+        self.assertEqual(crashed.batches, [[self.jobs[0].id, self.jobs[1].id]])
+        self.assertEqual(fresh.batches, [[self.jobs[2].id]])
+        self.assertEqual(self.statuses(), [PredictionJob.FAILED, PredictionJob.FAILED, PredictionJob.SUCCEEDED])
+        self.assertEqual(PredictionJob.objects.get(id=self.jobs[0].id).error, 'The prediction worker process crashed')
+
+
+class TelegramWebhookTests(TransactionTestCase):
+    """Updates posted to the webhook route, answered through the fake Bot API."""
+
+    secret = 'webhook-secret'
+    chat_id = 1000
+
+    def setUp(self):
+        self.calls = []
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(FakeBotAPI(log=self.calls.append)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        plots = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, plots)
+        plot_urls = []
+        for name in ('AAPL_test.png', 'AAPL_full.png'):
+            plot_urls.append(os.path.join(plots, name))
+            with open(plot_urls[-1], 'wb') as f:
+                f.write(name.encode())
+        prediction = mock.Mock(next_day_price=123.456, plot_urls=plot_urls)
+
+        for patcher in (
+            mock.patch('core.management.commands.telegrambot.TELEGRAM_API_URL', f'http://127.0.0.1:{server.server_port}'),
+            mock.patch('core.management.commands.telegrambot.get_prediction', return_value=(prediction, None)),
+            mock.patch('core.views.TELEGRAM_WEBHOOK_SECRET', self.secret),
+            mock.patch.object(telegram_webhook, '_application', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # The row /start creates
+        user = User.objects.create_user(str(self.chat_id))
+        TelegramUser.objects.create(user=user, chat_id=self.chat_id, username='tester')
+
+    async def post_update(self, text, secret):
+        return await self.async_client.post(
+            '/telegram/webhook/', FakeTelegram.update(1, text, self.chat_id), content_type='application/json',
+            headers={'X-Telegram-Bot-Api-Secret-Token': secret},
+        )
+
+    async def wait_for_call(self, method, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            methods = [call.split(' ', 1)[0] for call in self.calls]
+            if method in methods:
+                return methods
+            await asyncio.sleep(0.05)
+        self.fail(f"No {method} call within {timeout}s; got {self.calls}")
+
+    async def stop_application(self):
+        # Started on this test's event loop, so it has to stop on it too
+        if telegram_webhook._application is not None:
+            await telegram_webhook._application.stop()
+            await telegram_webhook._application.shutdown()
+
+    async def test_predict_replies_with_the_prediction_and_plots(self):
+        try:
+            response = await self.post_update('/predict AAPL', self.secret)
+            self.assertEqual(response.status_code, 200)
+            methods = await self.wait_for_call('sendMediaGroup')
+        finally:
+            await self.stop_application()
+
+        self.assertEqual(methods, ['getMe', 'sendMessage', 'sendMessage', 'sendMediaGroup'])
+        texts = [json.loads(call.split(' ', 1)[1])['text'] for call in self.calls if call.startswith('sendMessage')]
+        self.assertIn('Fetching prediction for ticker: AAPL', texts[0])
+        self.assertIn('Next Day Price: 123.46', texts[1])
+        self.assertEqual((await TelegramUser.objects.aget(chat_id=self.chat_id)).daily_request_count, 1)
+
+    async def test_wrong_secret_is_refused(self):
+        response = await self.post_update('/predict AAPL', 'not-the-secret')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNone(telegram_webhook._application)
+        self.assertEqual(self.calls, [])
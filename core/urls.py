@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import register_view, login_view, logout_view, dashboard_view, create_checkout_session, stripe_webhook
+from .views import register_view, login_view, logout_view, dashboard_view, create_checkout_session, stripe_webhook, telegram_webhook, metrics_view
 
 urlpatterns = [
     path('register/', register_view, name='register'),
@@ -8,4 +8,6 @@ urlpatterns = [
     path('', dashboard_view, name='dashboard'),
     path('checkout/', create_checkout_session, name='create_checkout_session'),
     path('webhooks/stripe/', stripe_webhook, name='stripe_webhook'),
+    path('telegram/webhook/', telegram_webhook, name='telegram_webhook'),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
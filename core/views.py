@@ -4,16 +4,32 @@ from django.contrib.auth import login, authenticate, logout
 from .forms import RegisterUserForm, LoginUserForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from api.models import StockPrediction
 from django.views.decorators.csrf import csrf_exempt
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.views.decorators.http import require_POST
+from django.http import HttpResponse
+import hmac
+import json
+from .dashboard import DASHBOARD_CACHE_TIMEOUT, KeysetPage, history_version, is_pro, prediction_count
 
 # For stripe payments
 from django.conf import settings
-import stripe
 from django.contrib.auth.models import User
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+# Telegram bot webhook mode
+from .telegram_webhook import TELEGRAM_WEBHOOK_SECRET, dispatch_update
+
+# Stage latency histograms
+from decouple import config
+from stock_insight.metrics import merged_stages, render_prometheus
+
+# Bearer token Prometheus must send to /metrics; without one the route is off
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+def get_stripe():
+    """Import stripe on first use; importing it adds about a second to worker startup."""
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
 
 # Create your views here.
 
@@ -67,26 +83,23 @@ def logout_view(request):
 @login_required(login_url='login')
 def dashboard_view(request):
     """Render the dashboard page."""
-    past_predictions = StockPrediction.objects.filter(user=request.user).order_by('-created_at')
-    user = request.user 
-    profile = get_or_create_user_profile(user)
-    # Pagination
-    paginator = Paginator(past_predictions, 10)  # Show 10 predictions per page
-    page_number = request.GET.get('page')
-    try:
-        past_predictions = paginator.get_page(page_number)
-    except PageNotAnInteger:
-        past_predictions = paginator.get_page(1)
-    except EmptyPage:
-        past_predictions = paginator.get_page(paginator.num_pages)
-    return render(request, 'dashboard.html', {'user': profile, 'past_predictions': past_predictions })
+    user = request.user
+    # Keyset pagination; rows and the count are only read if the history fragment isn't cached
+    past_predictions = KeysetPage(user.id, before=request.GET.get('before'), after=request.GET.get('after'))
+    return render(request, 'dashboard.html', {
+        'is_pro': is_pro(user.id),
+        'past_predictions': past_predictions,
+        'prediction_count': lambda: prediction_count(user.id),
+        'history_version': history_version(user.id),
+        'history_cache_timeout': DASHBOARD_CACHE_TIMEOUT,
+    })
 
 
 @csrf_exempt
 def create_checkout_session(request):
     """Create a Stripe checkout session."""
     user = request.user
-    checkout_session = stripe.checkout.Session.create(
+    checkout_session = get_stripe().checkout.Session.create(
         payment_method_types=['card'],
         line_items=[
             {
@@ -119,7 +132,7 @@ def stripe_webhook(request):
     event = None
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
+        event = get_stripe().Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -148,4 +161,27 @@ def stripe_webhook(request):
 
     return JsonResponse({'status': 'ok'})
 
-    
\ No newline at end of file
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """Receive bot updates from Telegram when it runs in webhook mode (manage.py telegrambot --set-webhook)."""
+    # Telegram echoes the secret given to setWebhook; without one configured the route is off
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not TELEGRAM_WEBHOOK_SECRET or not hmac.compare_digest(token, TELEGRAM_WEBHOOK_SECRET):
+        return HttpResponse(status=403)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    await dispatch_update(data)
+    return HttpResponse(status=200)
+
+
+def metrics_view(request):
+    """Stage latency histograms of all processes on this host, in the Prometheus text format."""
+    if not METRICS_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"):
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(merged_stages()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,11 @@
+"""
+Gunicorn configuration for the stock_insight web workers.
+
+Web workers only queue prediction jobs and read the database; the model is
+loaded by the prediction worker (api.worker), so there is nothing to preload
+here.
+"""
+import os
+
+# Threads per worker, for overlapping slow clients and database waits
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
@@ -0,0 +1,102 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from decouple import config
+
+from ml_model.registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on windows per forward pass; also bounds the LSTM activations kept in memory
+PREDICT_BATCH_SIZE = config("PREDICT_BATCH_SIZE", default=1024, cast=int)
+# How long the first request in a batch waits for others to join it
+PREDICT_BATCH_WAIT_MS = config("PREDICT_BATCH_WAIT_MS", default=5, cast=float)
+
+
+class BatchingEngine:
+    """
+    Runs model inference for all threads of a process on one worker thread.
+
+    Window tensors submitted by concurrent callers are queued for up to
+    `max_wait_ms`, stacked into a single batch of at most `max_batch_size`
+    windows, run through the model in one `predict` call and the outputs are
+    scattered back to each caller's future.
+    """
+
+    def __init__(self, max_batch_size=PREDICT_BATCH_SIZE, max_wait_ms=PREDICT_BATCH_WAIT_MS, model_registry=registry):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.registry = model_registry
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so a forked worker starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, x):
+        """
+        Queue a (n, window, 1) array for inference. The returned future resolves
+        to `(y_pred, loaded_model)` where `y_pred` has shape (n, 1).
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((x, future))
+        return future
+
+    def predict(self, x):
+        return self.submit(x).result()
+
+    def _collect(self):
+        items = [self._queue.get()]
+        size = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = [(x, future) for x, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not items:
+                continue
+            arrays = [x for x, _ in items]
+            futures = [future for _, future in items]
+            try:
+                loaded = self.registry.get()
+                batch = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+                y_pred = loaded.model.predict(batch, batch_size=self.max_batch_size, verbose=0)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(futures)} request(s): {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            offsets = np.cumsum([len(x) for x in arrays])[:-1]
+            for future, part in zip(futures, np.split(y_pred, offsets)):
+                future.set_result((part, loaded))
+
+
+engine = BatchingEngine()
@@ -0,0 +1,138 @@
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+from django.utils.module_loading import import_string
+
+from ml_model.predict_utils import predict_with_plot
+from ml_model.registry import registry
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_CACHE_BACKEND = config("PREDICTION_CACHE_BACKEND", default="ml_model.cache.DjangoCacheBackend")
+PREDICTION_CACHE_TTL = config("PREDICTION_CACHE_TTL", default=12 * 60 * 60, cast=int)
+PREDICTION_CACHE_MAX_ENTRIES = config("PREDICTION_CACHE_MAX_ENTRIES", default=256, cast=int)
+
+
+class LocMemBackend:
+    """Per-process LRU cache with a time-to-live on every entry."""
+
+    def __init__(self, ttl=PREDICTION_CACHE_TTL, max_entries=PREDICTION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class DjangoCacheBackend:
+    """
+    Stores entries in a Django cache (settings.CACHES), so processes can share
+    them when that cache is shared. Eviction is left to the Django backend.
+    """
+
+    def __init__(self, ttl=PREDICTION_CACHE_TTL, alias="default"):
+        from django.core.cache import caches
+
+        self.ttl = ttl
+        self._cache = caches[alias]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, self.ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+class PredictionCache:
+    """
+    Prediction results keyed by ticker, date of the last bar and model checksum.
+
+    Only results whose plots rendered successfully, or were skipped, are
+    stored. A hit whose plot or series files have since been removed is
+    treated as a miss, and so is one without plots when plots are wanted.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or import_string(PREDICTION_CACHE_BACKEND)()
+
+    @staticmethod
+    def key(ticker, df):
+        last_bar = df.index[-1].strftime("%Y-%m-%d")
+        return f"prediction:{ticker.upper()}:{last_bar}:{registry.version}"
+
+    def get(self, key, plots=True):
+        result = self.backend.get(key)
+        if result is None:
+            return None
+        if plots and not result["plot_urls"]:
+            return None
+        files = result["plot_urls"] + [result.get("series_path") or ""]
+        if not all(os.path.exists(path) for path in files):
+            self.backend.delete(key)
+            return None
+        return copy.deepcopy(result)
+
+    def set(self, key, result):
+        result = {k: v for k, v in result.items() if k != "plot_future"}
+        result["plot_status"] = "ready" if result["plot_urls"] else "skipped"
+        self.backend.set(key, copy.deepcopy(result))
+
+    def predict_with_plot(self, df, ticker, defer_plots=False, plots=True):
+        """
+        Same contract as `ml_model.predict_utils.predict_with_plot`, served from
+        the cache when possible. Hits never carry a "plot_future".
+        """
+        key = self.key(ticker, df)
+        result = self.get(key, plots=plots)
+        if result is not None:
+            logger.info(f"Prediction cache hit for {key}")
+            return result
+
+        result = predict_with_plot(df, ticker, defer_plots=defer_plots, plots=plots)
+        if "plot_future" in result:
+            computed = dict(result)
+
+            def _on_rendered(future):
+                if future.exception() is None:
+                    self.set(key, computed)
+            result["plot_future"].add_done_callback(_on_rendered)
+        else:
+            self.set(key, result)
+        return result
+
+
+prediction_cache = PredictionCache()
+
+
+def cached_predict_with_plot(df, ticker, defer_plots=False, plots=True):
+    return prediction_cache.predict_with_plot(df, ticker, defer_plots=defer_plots, plots=plots)
@@ -0,0 +1,151 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+from decouple import config
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ml_model.registry import WINDOW_SIZE
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_STATE_DIR = config("INFERENCE_STATE_DIR", default="data/state/")
+INCREMENTAL_INFERENCE = config("INCREMENTAL_INFERENCE", default=True, cast=bool)
+
+
+def bar_days(df):
+    """Bar dates of `df` as int64 days since the epoch."""
+    return df.index.values.astype("datetime64[D]").astype(np.int64)
+
+
+class InferenceState:
+    """
+    Everything needed to extend a ticker's scored test segment by new bars.
+
+    Keeps the scaler parameters frozen at the first full run, the actual and
+    predicted price for every scored day, and running sums from which MSE and
+    R² are derived in O(1).
+    """
+
+    def __init__(self, version, lo, rng, days, y_test, y_pred):
+        self.version = version
+        self.lo = float(lo)
+        self.rng = float(rng)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.y_test = np.asarray(y_test, dtype=np.float64).reshape(-1)
+        self.y_pred = np.asarray(y_pred, dtype=np.float64).reshape(-1)
+        err = self.y_test - self.y_pred
+        self.n = len(self.y_test)
+        self.sse = float(err @ err)
+        self.sum_y = float(self.y_test.sum())
+        self.sum_y2 = float(self.y_test @ self.y_test)
+
+    def metrics(self):
+        mse = self.sse / self.n
+        sst = self.sum_y2 - self.sum_y * self.sum_y / self.n
+        return {
+            "mse": float(mse),
+            "rmse": float(np.sqrt(mse)),
+            "r2": float(1.0 - self.sse / sst) if sst else 0.0,
+        }
+
+    def _drop_last(self):
+        y, p = self.y_test[-1], self.y_pred[-1]
+        self.sse -= (y - p) ** 2
+        self.sum_y -= y
+        self.sum_y2 -= y * y
+        self.n -= 1
+        self.days, self.y_test, self.y_pred = self.days[:-1], self.y_test[:-1], self.y_pred[:-1]
+
+    def advance(self, df, predict, window=WINDOW_SIZE):
+        """
+        Score the bars of `df` after the last scored day and fold them into
+        the running sums. `predict` is called with the new windows only and
+        must return `(y_pred, loaded_model)`.
+
+        Returns False if this state can't be extended from `df` (the stored
+        history no longer lines up or the model changed) and should be rebuilt.
+        """
+        days = bar_days(df)
+        pos = int(np.searchsorted(days, self.days[-1]))
+        if pos >= len(days) or days[pos] != self.days[-1] or pos < window:
+            return False
+
+        # The last scored bar may have been a partial intraday one, so it is scored again
+        close = df['Close'].to_numpy().reshape(-1)
+        buf = close[pos - window:].astype(np.float32)
+        buf -= self.lo
+        buf /= self.rng
+        x_new = sliding_window_view(buf[:-1], window)[..., np.newaxis]
+
+        y_new, loaded = predict(x_new)
+        if loaded.version != self.version:
+            return False
+
+        y_new = y_new.reshape(-1).astype(np.float64) * self.rng + self.lo
+        actual = close[pos:].astype(np.float64)
+        self._drop_last()
+
+        err = actual - y_new
+        self.sse += float(err @ err)
+        self.sum_y += float(actual.sum())
+        self.sum_y2 += float(actual @ actual)
+        self.n += len(actual)
+        self.days = np.concatenate([self.days, days[pos:]])
+        self.y_test = np.concatenate([self.y_test, actual])
+        self.y_pred = np.concatenate([self.y_pred, y_new])
+        return True
+
+    def to_arrays(self):
+        return {
+            "version": np.array(self.version),
+            "params": np.array([self.lo, self.rng, self.n, self.sse, self.sum_y, self.sum_y2]),
+            "days": self.days,
+            "y_test": self.y_test,
+            "y_pred": self.y_pred,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        lo, rng, n, sse, sum_y, sum_y2 = arrays["params"]
+        state = cls.__new__(cls)
+        state.version = str(arrays["version"])
+        state.lo, state.rng = float(lo), float(rng)
+        state.n, state.sse, state.sum_y, state.sum_y2 = int(n), float(sse), float(sum_y), float(sum_y2)
+        state.days, state.y_test, state.y_pred = arrays["days"], arrays["y_test"], arrays["y_pred"]
+        return state
+
+
+class StateStore:
+    """One `.npz` file of InferenceState per ticker."""
+
+    def __init__(self, root=INFERENCE_STATE_DIR):
+        self.root = root
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker.upper()}.npz")
+
+    def load(self, ticker):
+        try:
+            with np.load(self.path(ticker)) as arrays:
+                return InferenceState.from_arrays(arrays)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable inference state for {ticker}: {e}")
+            return None
+
+    def save(self, ticker, state):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **state.to_arrays())
+            os.replace(tmp_path, self.path(ticker))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+states = StateStore()
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+
+SUPPORTED_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    # Same as 1 / (1 + exp(-x)) without overflow for large negative inputs
+    "sigmoid": lambda x: 0.5 * (np.tanh(0.5 * x) + 1.0),
+}
+
+
+def export_weights(model, out_path):
+    """
+    Write the layers of a Keras Sequential LSTM/Dense model to an `.npz` file
+    readable by `NumpyModel`, without any Keras objects in it.
+    """
+    specs, arrays = [], {}
+    for layer in model.layers:
+        cfg = layer.get_config()
+        i = len(specs)
+        kind = type(layer).__name__
+        if kind == "LSTM":
+            if cfg.get("activation") != "tanh" or cfg.get("recurrent_activation") != "sigmoid":
+                raise ValueError(f"Unsupported LSTM activations in layer {layer.name}")
+            if not cfg.get("use_bias", True) or cfg.get("go_backwards") or cfg.get("stateful"):
+                raise ValueError(f"Unsupported LSTM options in layer {layer.name}")
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            specs.append({"type": "lstm", "units": cfg["units"], "return_sequences": cfg["return_sequences"]})
+            arrays.update({f"{i}.kernel": kernel, f"{i}.recurrent_kernel": recurrent_kernel, f"{i}.bias": bias})
+        elif kind == "Dense":
+            if cfg.get("activation") not in SUPPORTED_ACTIVATIONS:
+                raise ValueError(f"Unsupported Dense activation in layer {layer.name}")
+            kernel, bias = layer.get_weights()
+            specs.append({"type": "dense", "activation": cfg["activation"]})
+            arrays.update({f"{i}.kernel": kernel, f"{i}.bias": bias})
+        elif kind in ("Dropout", "InputLayer"):
+            # No-ops at inference time
+            continue
+        else:
+            raise ValueError(f"Unsupported layer type {kind} ({layer.name})")
+
+    arrays = {name: np.asarray(value, dtype=np.float32) for name, value in arrays.items()}
+    np.savez(out_path, layers=np.array(json.dumps(specs)), **arrays)
+    return out_path
+
+
+def lstm_forward(x, kernel, recurrent_kernel, bias, return_sequences):
+    """
+    Keras LSTM forward pass (gate order i, f, c, o) over a (batch, time, features) array.
+    """
+    batch, steps, _ = x.shape
+    units = recurrent_kernel.shape[0]
+    sigmoid = SUPPORTED_ACTIVATIONS["sigmoid"]
+
+    # Input projections for every timestep in one matmul; only the recurrence is sequential
+    xw = x.reshape(-1, x.shape[2]) @ kernel
+    xw += bias
+    xw = xw.reshape(batch, steps, 4 * units)
+
+    h = np.zeros((batch, units), dtype=x.dtype)
+    c = np.zeros((batch, units), dtype=x.dtype)
+    outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+    for t in range(steps):
+        z = xw[:, t] + h @ recurrent_kernel
+        i = sigmoid(z[:, :units])
+        f = sigmoid(z[:, units:2 * units])
+        g = np.tanh(z[:, 2 * units:3 * units])
+        o = sigmoid(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        if return_sequences:
+            outputs[:, t] = h
+    return outputs if return_sequences else h
+
+
+class NumpyModel:
+    """
+    Inference-only model built from an `export_weights` file. Its `predict`
+    accepts the same arguments as the Keras one used in this project.
+    """
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.specs = json.loads(str(data["layers"]))
+            self.weights = {name: data[name] for name in data.files if name != "layers"}
+
+    def _forward(self, x):
+        for i, spec in enumerate(self.specs):
+            kernel, bias = self.weights[f"{i}.kernel"], self.weights[f"{i}.bias"]
+            if spec["type"] == "lstm":
+                x = lstm_forward(x, kernel, self.weights[f"{i}.recurrent_kernel"], bias, spec["return_sequences"])
+            else:
+                x = SUPPORTED_ACTIVATIONS[spec["activation"]](x @ kernel + bias)
+        return x
+
+    def predict(self, x, batch_size=None, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        batch_size = batch_size or len(x) or 1
+        parts = [self._forward(x[start:start + batch_size]) for start in range(0, len(x), batch_size)]
+        return np.concatenate(parts) if parts else np.empty((0, 1), dtype=np.float32)
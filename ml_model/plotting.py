@@ -0,0 +1,98 @@
+import logging
+import os
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+from stock_insight.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+PLOT_WORKERS = config("PLOT_WORKERS", default=2, cast=int)
+# Renders allowed to wait for a worker before submit() blocks the caller
+PLOT_QUEUE_SIZE = config("PLOT_QUEUE_SIZE", default=32, cast=int)
+
+FIGSIZE = (12, 5)
+
+
+def new_figure():
+    """Create a figure bound to its own Agg canvas, independent of pyplot's global state."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=FIGSIZE)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure(fig, path):
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+@timer('plot_prediction')
+def render_prediction(y_test, y_pred, ticker, path):
+    fig = new_figure()
+    ax = fig.add_subplot()
+    ax.plot(y_test, 'b', label='Original Price')
+    ax.plot(y_pred, 'r', label='Predicted Price')
+    ax.set_title(f'Final Prediction for {ticker}')
+    ax.set_xlabel('Days')
+    ax.set_ylabel('Price')
+    ax.legend()
+    return save_figure(fig, path)
+
+
+@timer('plot_history')
+def render_history(dates, close, ticker, path):
+    fig = new_figure()
+    ax = fig.add_subplot()
+    ax.plot(dates, close)
+    ax.set_title(f"{ticker} Closing Price History")
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Price')
+    ax.legend(['Close Price'])
+    return save_figure(fig, path)
+
+
+def render_plots(y_test, y_pred, dates, close, ticker, out_dir):
+    """Render history.png and predicted.png into `out_dir` and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    history_path = render_history(dates, close, ticker, os.path.join(out_dir, "history.png"))
+    pred_path = render_prediction(y_test, y_pred, ticker, os.path.join(out_dir, "predicted.png"))
+    return [history_path, pred_path]
+
+
+class PlotRenderer:
+    """
+    Bounded thread pool for plot rendering.
+
+    At most `max_workers` plots render at once and at most `max_pending` more
+    wait for a worker; beyond that `submit()` blocks until a slot frees up.
+    """
+
+    def __init__(self, max_workers=PLOT_WORKERS, max_pending=PLOT_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plot-render")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _render(self, *args):
+        try:
+            return render_plots(*args)
+        except Exception as e:
+            logger.error(f"Plot rendering failed for {args[4]}: {e}")
+            raise
+        finally:
+            self._slots.release()
+
+    def submit(self, y_test, y_pred, dates, close, ticker, out_dir):
+        """Queue a render of both plots; the future resolves to their paths."""
+        self._slots.acquire()
+        # In the caller's context, so the render times count towards its collected timings
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._render, y_test, y_pred, dates, close, ticker, out_dir)
+
+
+renderer = PlotRenderer()
@@ -1,84 +1,122 @@
 import os
+import hashlib
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
-from keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error, r2_score
+from numpy.lib.stride_tricks import sliding_window_view
 from datetime import datetime
 
+from ml_model.registry import WINDOW_SIZE, registry
+from ml_model.batching import engine
+from ml_model.store import store
+from ml_model.plotting import renderer
+from ml_model.series import write_series
+from ml_model.incremental import INCREMENTAL_INFERENCE, InferenceState, bar_days, states
+from stock_insight.metrics import timer
+
 MEDIA_DIR = "media/"
-MODEL_PATH = os.path.dirname(__file__) + "/stock_prediction_model.keras"
 
-def save_plot(path):
-    plt.tight_layout()
-    plt.savefig(path)
-    plt.close()
-    return path
+def plot_dir(ticker, timestamp):
+    """
+    Directory for one prediction's plots, sharded by hash so no single
+    directory under MEDIA_DIR grows with the number of predictions.
+    """
+    name = f"{ticker}_{timestamp}"
+    shard = hashlib.sha1(name.encode()).hexdigest()[:2]
+    return os.path.join(MEDIA_DIR, shard, name)
 
+@timer('fetch')
 def fetch_ohlcv_data(ticker: str) -> pd.DataFrame:
-    df = yf.download(ticker, period="10y", interval="1d")
+    try:
+        df = store.read(ticker)
+    except ValueError:
+        return pd.DataFrame()
     if df is None or df.empty:
         return pd.DataFrame()
     return df
 
-def predict_with_plot(df, ticker):
+@timer('windowing')
+def build_windows(df, window=WINDOW_SIZE):
+    """
+    Scale the test segment (plus the last `window` training closes) to [0, 1]
+    and return `(x_test, y_test, lo, rng)`.
+
+    The closes are copied once into a contiguous float32 buffer which is scaled
+    in place; `x_test` is a (n, window, 1) sliding-window view and `y_test` a
+    view of the same buffer, so no per-window arrays are allocated.
+    """
+    close = df['Close'].to_numpy().reshape(-1)
+    split = int(len(close) * 0.7)
+    buf = close[max(split - window, 0):].astype(np.float32)
+
+    # Same transform as MinMaxScaler(feature_range=(0, 1)).fit_transform
+    lo = buf.min()
+    rng = buf.max() - lo or np.float32(1.0)
+    buf -= lo
+    buf /= rng
+
+    x_test = sliding_window_view(buf[:-1], window)[..., np.newaxis]
+    y_test = buf[window:]
+    return x_test, y_test, lo, rng
 
-    # Split data
-    train = df.Close[0:int(len(df)*0.7)]
-    test = df.Close[int(len(df)*0.7):]
+def run_inference(x):
+    """engine.predict, timed from the caller's side including the wait for a batch."""
+    with timer('inference'):
+        return engine.predict(x)
 
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    model = load_model(MODEL_PATH)
+def score_test_segment(df):
+    """Score every window of the test segment and return a fresh InferenceState."""
+    x_test, _, lo, rng = build_windows(df)
+    # Batched with any concurrent requests in this process
+    y_pred, loaded = run_inference(x_test)
+    y_pred = y_pred.reshape(-1) * rng + lo
+    y_test = df['Close'].to_numpy().reshape(-1)[-len(y_pred):]
+    return InferenceState(loaded.version, lo, rng, bar_days(df)[-len(y_pred):], y_test, y_pred)
 
-    past_100 = train.tail(100)
-    final_df = pd.concat([past_100, test], ignore_index=True)
-    input_data = scaler.fit_transform(final_df.values.reshape(-1, 1))
+def predict_with_plot(df, ticker, defer_plots=False, plots=True):
+    """
+    Predict the next closing price for `ticker` from its OHLCV history.
 
-    x_test, y_test = [], []
-    for i in range(100, len(input_data)):
-        x_test.append(input_data[i-100:i])
-        y_test.append(input_data[i, 0])
-    x_test, y_test = np.array(x_test), np.array(y_test)
+    The scored test segment is always saved as a float32 series file (see
+    ml_model.series) under "series_path", for clients that draw their own
+    charts. With `plots=False` no PNGs are rendered and `plot_status` is
+    "skipped".
 
-    y_pred = model.predict(x_test)
-    y_pred = scaler.inverse_transform(y_pred)
-    y_test = scaler.inverse_transform(y_test.reshape(-1, 1))
+    Otherwise plots are rendered on the shared plot renderer pool. By default
+    this waits for them; with `defer_plots=True` it returns as soon as the
+    prediction is known, with `plot_status` "pending" and the render's future
+    under "plot_future", which the caller must pop before serializing the result.
+    """
+
+    state = states.load(ticker) if INCREMENTAL_INFERENCE else None
+    # With a usable stored state only the bars since the last run go through the model
+    if state is None or state.version != registry.version or not state.advance(df, run_inference):
+        state = score_test_segment(df)
+    if INCREMENTAL_INFERENCE:
+        states.save(ticker, state)
+
+    y_test = state.y_test.reshape(-1, 1)
+    y_pred = state.y_pred.reshape(-1, 1)
 
-    # Plot prediction
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_dir = os.path.join(MEDIA_DIR, f"{ticker}_{timestamp}")
-    os.makedirs(out_dir, exist_ok=True)
-
-    plt.figure(figsize=(12, 5))
-    plt.switch_backend('AGG')
-    plt.plot(y_test, 'b', label='Original Price')
-    plt.plot(y_pred, 'r', label='Predicted Price')
-    plt.title(f'Final Prediction for {ticker}')
-    plt.xlabel('Days')
-    plt.ylabel('Price')
-    plt.legend()
-    pred_path = os.path.join(out_dir, "predicted.png")
-    save_plot(pred_path)
-
-    # Plot historical prices
-    plt.figure(figsize=(12, 5))
-    plt.switch_backend('AGG')
-    df['Close'].plot(title=f"{ticker} Closing Price History")
-    plt.xlabel('Date')
-    plt.ylabel('Price')
-    plt.legend(['Close Price'])
-    history_path = os.path.join(out_dir, "history.png")
-    save_plot(history_path)
-
-    return {
+    out_dir = plot_dir(ticker, timestamp)
+    with timer('series_write'):
+        series_path = write_series(out_dir, state.days, y_test, y_pred)
+    result = {
         "next_day_price": float(y_pred[-1][0]),
-        "plot_urls": [f"{out_dir}/history.png", f"{out_dir}/predicted.png"],
-        "metrics": {
-            "mse": float(mean_squared_error(y_test, y_pred)),
-            "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
-            "r2": float(r2_score(y_test, y_pred))
-        }
+        "plot_urls": [],
+        "plot_status": "skipped",
+        "series_path": series_path,
+        "metrics": dict(state.metrics(), model_version=state.version)
     }
-    
\ No newline at end of file
+    if not plots:
+        return result
+
+    plot_future = renderer.submit(y_test, y_pred, df.index, df['Close'].to_numpy().reshape(-1), ticker, out_dir)
+    if not defer_plots:
+        plot_future.result()
+
+    result["plot_urls"] = [f"{out_dir}/history.png", f"{out_dir}/predicted.png"]
+    result["plot_status"] = "pending" if defer_plots else "ready"
+    if defer_plots:
+        result["plot_future"] = plot_future
+    return result
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from decouple import config
+
+from stock_insight.metrics import timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "stock_prediction_model.keras")
+MODEL_PATH = config("MODEL_PATH", default="") or DEFAULT_MODEL_PATH
+
+# "keras", or "numpy" to serve an exported weights file without importing TensorFlow
+MODEL_BACKEND = config("MODEL_BACKEND", default="keras")
+DEFAULT_NUMPY_MODEL_PATH = os.path.join(os.path.dirname(__file__), "stock_prediction_model.npz")
+NUMPY_MODEL_PATH = config("NUMPY_MODEL_PATH", default="") or DEFAULT_NUMPY_MODEL_PATH
+
+# How often (in seconds) a process re-stats the model file to pick up a new one
+MODEL_RELOAD_INTERVAL = config("MODEL_RELOAD_INTERVAL", default=30, cast=int)
+
+WINDOW_SIZE = 100
+
+
+def file_checksum(path):
+    """Return the sha256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_model_file(path, backend=MODEL_BACKEND):
+    """Deserialize a model file with the given backend."""
+    if backend == "numpy":
+        from ml_model.numpy_runtime import NumpyModel
+
+        return NumpyModel(path)
+    if backend != "keras":
+        raise ValueError(f"Unknown MODEL_BACKEND: {backend}")
+    from keras.models import load_model
+
+    return load_model(path)
+
+
+class LoadedModel:
+    """A loaded model together with the file identity it was built from."""
+
+    def __init__(self, model, path, checksum, mtime):
+        self.model = model
+        self.path = path
+        self.checksum = checksum
+        self.mtime = mtime
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        return self.checksum[:12]
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the prediction model.
+
+    The model is deserialized once per process and warmed up with a dummy
+    inference. Replacing the file at ``path`` (e.g. by an atomic rename) is
+    noticed on the next ``get()`` after ``reload_interval`` seconds, and the
+    new model is swapped in without restarting the process.
+    """
+
+    def __init__(self, path=None, backend=MODEL_BACKEND, reload_interval=MODEL_RELOAD_INTERVAL):
+        self.backend = backend
+        self.path = path or (NUMPY_MODEL_PATH if backend == "numpy" else MODEL_PATH)
+        self.reload_interval = reload_interval
+        self._current = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    @timer('model_load')
+    def _build(self, path):
+        checksum = file_checksum(path)
+        mtime = os.stat(path).st_mtime
+        model = load_model_file(path, self.backend)
+        # Warm-up so the first real request doesn't pay for graph building
+        model.predict(np.zeros((1, WINDOW_SIZE, 1), dtype=np.float32), verbose=0)
+        logger.info(f"Loaded {self.backend} model {path} (version {checksum[:12]})")
+        return LoadedModel(model, path, checksum, mtime)
+
+    def load(self):
+        """Load the model if it isn't loaded yet and return it."""
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = self._build(self.path)
+                    self._last_check = time.monotonic()
+        return self._current
+
+    def swap(self, path=None):
+        """
+        Build a model from ``path`` (defaults to the registry path) and make it
+        current. The old model keeps serving until the new one is fully built.
+        """
+        path = path or self.path
+        loaded = self._build(path)
+        with self._lock:
+            self._current = loaded
+            self.path = path
+            self._last_check = time.monotonic()
+        return loaded
+
+    def _file_changed(self):
+        current = self._current
+        try:
+            return os.stat(self.path).st_mtime != current.mtime
+        except OSError:
+            return False
+
+    def get(self):
+        """Return the current ``LoadedModel``, reloading it if the file changed."""
+        current = self.load()
+        if self.reload_interval and time.monotonic() - self._last_check >= self.reload_interval:
+            self._last_check = time.monotonic()
+            if self._file_changed():
+                try:
+                    current = self.swap()
+                except Exception as e:
+                    logger.error(f"Failed to reload model from {self.path}: {e}")
+        return current
+
+    @property
+    def version(self):
+        return self.get().version
+
+
+registry = ModelRegistry()
+
+
+def preload():
+    """Load and warm up the model ahead of the first request."""
+    return registry.load()
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+import numpy as np
+
+SERIES_FILE = "series.f32"
+# Rows of the file, in order; each holds one float32 per scored day
+SERIES_ROWS = ("days", "actual", "predicted")
+SERIES_DTYPE = np.dtype("<f4")
+
+
+def write_series(out_dir, days, y_test, y_pred):
+    """
+    Store the scored test segment of a prediction in `out_dir` and return the file's path.
+
+    The file is a bare little-endian float32 array of shape (3, n): the bar
+    dates as days since 1970-01-01, the actual closes and the predicted closes.
+    Days stay exact in float32 until the year 47000.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, SERIES_FILE)
+    data = np.stack([np.asarray(days), np.asarray(y_test).reshape(-1), np.asarray(y_pred).reshape(-1)])
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data.astype(SERIES_DTYPE).tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def read_series(path):
+    """`(days, actual, predicted)` from a file written by write_series, days as datetime64[D]."""
+    data = np.fromfile(path, dtype=SERIES_DTYPE).reshape(len(SERIES_ROWS), -1)
+    return data[0].astype(np.int64).astype("datetime64[D]"), data[1], data[2]
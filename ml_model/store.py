@@ -0,0 +1,218 @@
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from decouple import config
+
+from ml_model.tickers import TICKER_RE
+
+logger = logging.getLogger(__name__)
+
+OHLCV_STORE_DIR = config("OHLCV_STORE_DIR", default="data/ohlcv/")
+# Seconds a stored history is served as-is before checking upstream for new bars
+OHLCV_REFRESH_INTERVAL = config("OHLCV_REFRESH_INTERVAL", default=3600, cast=int)
+# Directory of <TICKER>.csv fixtures to use instead of Yahoo Finance
+OHLCV_SOURCE_DIR = config("OHLCV_SOURCE_DIR", default="")
+
+HISTORY_YEARS = 10
+COLUMNS = ("Close", "High", "Low", "Open", "Volume")
+
+def normalize_frame(df):
+    """Flatten yfinance's (Price, Ticker) columns and keep the OHLCV columns we store."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df.loc[:, [c for c in COLUMNS if c in df.columns]]
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None).normalize()
+    df.index.name = "Date"
+    return df.dropna(subset=["Close"])
+
+
+class YahooSource:
+    """Daily bars from Yahoo Finance."""
+
+    def fetch(self, ticker, start=None):
+        import yfinance as yf
+
+        if start is None:
+            df = yf.download(ticker, period=f"{HISTORY_YEARS}y", interval="1d", progress=False)
+        else:
+            df = yf.download(ticker, start=start.strftime("%Y-%m-%d"), interval="1d", progress=False)
+        return normalize_frame(df)
+
+    def fetch_many(self, tickers, start=None):
+        """Bars for several tickers in one download, as {ticker: frame}."""
+        import yfinance as yf
+
+        if start is None:
+            kwargs = {"period": f"{HISTORY_YEARS}y"}
+        else:
+            kwargs = {"start": start.strftime("%Y-%m-%d")}
+        df = yf.download(list(tickers), interval="1d", group_by="ticker", progress=False, threads=True, **kwargs)
+        present = set(df.columns.get_level_values(0)) if isinstance(df.columns, pd.MultiIndex) else set()
+        return {ticker: normalize_frame(df[ticker] if ticker in present else None) for ticker in tickers}
+
+
+class CsvSource:
+    """Daily bars read from `<directory>/<TICKER>.csv`, e.g. test fixtures."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start=None):
+        path = os.path.join(self.directory, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return normalize_frame(None)
+        df = normalize_frame(pd.read_csv(path, index_col=0, parse_dates=True))
+        if start is not None:
+            df = df[df.index >= start]
+        return df
+
+    def fetch_many(self, tickers, start=None):
+        return {ticker: self.fetch(ticker, start=start) for ticker in tickers}
+
+
+def default_source():
+    if OHLCV_SOURCE_DIR:
+        return CsvSource(OHLCV_SOURCE_DIR)
+    return YahooSource()
+
+
+class OHLCVStore:
+    """
+    On-disk daily history, one columnar `.npy` file per ticker.
+
+    Each file holds a float64 array of shape (1 + len(COLUMNS), n_bars): row 0 is
+    the bar date as days since the epoch, the other rows are the OHLCV columns,
+    so every column is contiguous and the file can be memory-mapped. Reads are
+    served from disk; once a file is older than `refresh_interval` seconds only
+    the bars from the last stored date onwards are requested from `source`.
+    """
+
+    def __init__(self, root=OHLCV_STORE_DIR, source=None, refresh_interval=OHLCV_REFRESH_INTERVAL):
+        self.root = root
+        self.source = source or default_source()
+        self.refresh_interval = refresh_interval
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npy")
+
+    def load(self, ticker):
+        """Memory-map the stored array for `ticker`, or return None."""
+        try:
+            return np.load(self.path(ticker), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+
+    def _is_fresh(self, ticker):
+        try:
+            return time.time() - os.stat(self.path(ticker)).st_mtime < self.refresh_interval
+        except FileNotFoundError:
+            return False
+
+    def _write(self, ticker, array):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            # Readers holding a map of the old file keep it until they drop it
+            os.replace(tmp_path, self.path(ticker))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def to_array(df):
+        days = df.index.values.astype("datetime64[D]").astype(np.int64)
+        rows = [days.astype(np.float64)]
+        for column in COLUMNS:
+            rows.append(df[column].to_numpy(dtype=np.float64) if column in df else np.full(len(df), np.nan))
+        return np.vstack(rows)
+
+    @staticmethod
+    def to_frame(array):
+        index = pd.DatetimeIndex(array[0].astype(np.int64).astype("datetime64[D]"), name="Date")
+        return pd.DataFrame({column: array[i + 1] for i, column in enumerate(COLUMNS)}, index=index)
+
+    def _merge(self, ticker, stored, delta):
+        """Merge `delta` into `stored`, its bars replacing overlapping ones, then write and return the result."""
+        if delta.empty:
+            os.utime(self.path(ticker))
+            return stored
+        new = self.to_array(delta)
+        array = np.hstack([stored[:, stored[0] < new[0, 0]], new])
+        self._write(ticker, array)
+        return array
+
+    @staticmethod
+    def last_day(stored):
+        return pd.Timestamp(int(stored[0, -1]), unit="D")
+
+    def refresh(self, ticker, stored=None):
+        """Fetch bars missing from the stored history and return the updated array."""
+        if stored is None:
+            stored = self.load(ticker)
+        if stored is None or stored.shape[1] == 0:
+            array = self.to_array(self.source.fetch(ticker))
+            if array.shape[1]:
+                self._write(ticker, array)
+            return array
+        # Refetch the last stored day as well, it may have been a partial intraday bar
+        return self._merge(ticker, stored, self.source.fetch(ticker, start=self.last_day(stored)))
+
+    def refresh_many(self, tickers):
+        """
+        Bring every stale ticker up to date with at most two upstream requests:
+        one for tickers without history and one for the delta of the rest,
+        starting at the oldest last stored day among them. Returns the number
+        of tickers that were refreshed.
+        """
+        missing, stale = [], {}
+        for ticker in tickers:
+            if self._is_fresh(ticker):
+                continue
+            stored = self.load(ticker)
+            if stored is None or stored.shape[1] == 0:
+                missing.append(ticker)
+            else:
+                stale[ticker] = stored
+
+        if missing:
+            for ticker, df in self.source.fetch_many(missing).items():
+                if not df.empty:
+                    self._write(ticker, self.to_array(df))
+        if stale:
+            start = min(self.last_day(stored) for stored in stale.values())
+            deltas = self.source.fetch_many(list(stale), start=start)
+            for ticker, stored in stale.items():
+                self._merge(ticker, stored, deltas[ticker])
+        return len(missing) + len(stale)
+
+    def read(self, ticker, years=HISTORY_YEARS):
+        """Return the last `years` years of daily bars for `ticker` as a DataFrame."""
+        ticker = ticker.upper()
+        if not TICKER_RE.match(ticker):
+            raise ValueError(f"Invalid ticker symbol: {ticker}")
+
+        array = self.load(ticker)
+        if array is None or not self._is_fresh(ticker):
+            try:
+                array = self.refresh(ticker, array)
+            except Exception as e:
+                if array is None:
+                    raise
+                logger.warning(f"Upstream refresh failed for {ticker}, serving stored history: {e}")
+
+        cutoff = (pd.Timestamp.today().normalize() - pd.DateOffset(years=years)).to_datetime64()
+        cutoff_day = cutoff.astype("datetime64[D]").astype(np.int64)
+        start = int(np.searchsorted(array[0], cutoff_day))
+        return self.to_frame(array[:, start:])
+
+
+store = OHLCVStore()
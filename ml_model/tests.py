@@ -0,0 +1,325 @@
+import importlib.util
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ml_model import predict_utils
+from ml_model.incremental import InferenceState, StateStore, bar_days
+from ml_model.numpy_runtime import NumpyModel, lstm_forward
+from ml_model.store import CsvSource, OHLCVStore
+from ml_model.registry import DEFAULT_MODEL_PATH, DEFAULT_NUMPY_MODEL_PATH, WINDOW_SIZE
+
+
+def reference_lstm(x, kernel, recurrent_kernel, bias, return_sequences):
+    """One sample and one timestep at a time, in float64, straight from the LSTM equations."""
+    sigmoid = lambda v: 1 / (1 + np.exp(-v))
+    units = recurrent_kernel.shape[0]
+    outputs = []
+    for sample in x.astype(np.float64):
+        h, c, sequence = np.zeros(units), np.zeros(units), []
+        for step in sample:
+            i, f, g, o = np.split(step @ kernel + h @ recurrent_kernel + bias, 4)
+            c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+            h = sigmoid(o) * np.tanh(c)
+            sequence.append(h)
+        outputs.append(sequence if return_sequences else h)
+    return np.array(outputs)
+
+
+def random_lstm(rng, features, units):
+    return (
+        rng.normal(0, 0.5, (features, 4 * units)).astype(np.float32),
+        rng.normal(0, 0.5, (units, 4 * units)).astype(np.float32),
+        rng.normal(0, 0.5, 4 * units).astype(np.float32),
+    )
+
+
+class LstmForwardTests(SimpleTestCase):
+    def test_matches_the_reference_implementation(self):
+        rng = np.random.default_rng(0)
+        x = rng.random((5, 12, 3), dtype=np.float32)
+        weights = random_lstm(rng, features=3, units=4)
+
+        for return_sequences in (True, False):
+            with self.subTest(return_sequences=return_sequences):
+                np.testing.assert_allclose(
+                    lstm_forward(x, *weights, return_sequences),
+                    reference_lstm(x, *weights, return_sequences),
+                    atol=1e-5,
+                )
+
+    def test_numpy_model_runs_the_exported_layers_in_order(self):
+        rng = np.random.default_rng(1)
+        first, second = random_lstm(rng, 1, 6), random_lstm(rng, 6, 4)
+        dense_kernel, dense_bias = rng.normal(0, 0.5, (4, 1)).astype(np.float32), np.float32([0.1])
+        specs = [
+            {"type": "lstm", "units": 6, "return_sequences": True},
+            {"type": "lstm", "units": 4, "return_sequences": False},
+            {"type": "dense", "activation": "linear"},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.npz")
+            np.savez(
+                path, layers=np.array(json.dumps(specs)),
+                **{"0.kernel": first[0], "0.recurrent_kernel": first[1], "0.bias": first[2]},
+                **{"1.kernel": second[0], "1.recurrent_kernel": second[1], "1.bias": second[2]},
+                **{"2.kernel": dense_kernel, "2.bias": dense_bias},
+            )
+            model = NumpyModel(path)
+        x = rng.random((7, 10, 1), dtype=np.float32)
+
+        expected = reference_lstm(reference_lstm(x, *first, True), *second, False) @ dense_kernel + dense_bias
+
+        # Split into uneven batches, as the batching engine may do
+        np.testing.assert_allclose(model.predict(x, batch_size=3), expected, atol=1e-5)
+
+
+@skipUnless(importlib.util.find_spec("tensorflow"), "TensorFlow is not installed")
+class KerasParityTests(SimpleTestCase):
+    def test_bundled_weights_match_the_keras_model(self):
+        from keras.models import load_model
+
+        rng = np.random.default_rng(0)
+        x = rng.random((64, WINDOW_SIZE, 1), dtype=np.float32)
+        x[0, :, 0] = np.linspace(0, 1, WINDOW_SIZE, dtype=np.float32)
+
+        expected = load_model(DEFAULT_MODEL_PATH).predict(x, verbose=0)
+
+        np.testing.assert_allclose(NumpyModel(DEFAULT_NUMPY_MODEL_PATH).predict(x), expected, atol=1e-4)
+
+
+def bars(days, close=100.0):
+    """`days` daily bars up to today, closes rising by 1 from `close`."""
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days, freq="D", name="Date")
+    closes = close + np.arange(days, dtype=np.float64)
+    return pd.DataFrame(
+        {"Close": closes, "High": closes + 1, "Low": closes - 1, "Open": closes, "Volume": 1000.0}, index=index
+    )
+
+
+class OHLCVStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sources = os.path.join(directory.name, "csv")
+        os.makedirs(self.sources)
+        self.source = mock.Mock(wraps=CsvSource(self.sources))
+        self.store = OHLCVStore(root=os.path.join(directory.name, "store"), source=self.source, refresh_interval=3600)
+
+    def publish(self, ticker, df):
+        df.to_csv(os.path.join(self.sources, f"{ticker}.csv"))
+
+    def age(self, ticker):
+        """Make the stored history of `ticker` older than the refresh interval."""
+        old = time.time() - 2 * self.store.refresh_interval
+        os.utime(self.store.path(ticker), (old, old))
+
+    def test_first_read_fetches_the_full_history(self):
+        self.publish("AAPL", bars(30))
+
+        df = self.store.read("aapl")
+
+        self.source.fetch.assert_called_once_with("AAPL")
+        self.assertEqual(len(df), 30)
+        self.assertEqual(list(df.index), list(bars(30).index))
+        self.assertEqual(df["Close"].tolist(), bars(30)["Close"].tolist())
+        self.assertTrue(os.path.exists(self.store.path("AAPL")))
+
+    def test_fresh_history_is_served_without_fetching(self):
+        self.publish("AAPL", bars(30))
+        self.store.read("AAPL")
+        self.source.reset_mock()
+
+        self.store.read("AAPL")
+
+        self.source.fetch.assert_not_called()
+
+    def test_stale_history_fetches_from_the_last_stored_day_and_replaces_it(self):
+        self.publish("AAPL", bars(30)[:-1])
+        self.store.read("AAPL")
+        # The last stored bar was partial; upstream now has its final close and one more bar
+        updated = bars(30)
+        updated.iloc[-2, updated.columns.get_loc("Close")] = 555.0
+        self.publish("AAPL", updated)
+        self.age("AAPL")
+        self.source.reset_mock()
+
+        df = self.store.read("AAPL")
+
+        self.source.fetch.assert_called_once_with("AAPL", start=updated.index[-2])
+        self.assertEqual(len(df), 30)
+        self.assertTrue(df.index.is_unique)
+        self.assertEqual(df["Close"].iloc[-2], 555.0)
+        self.assertEqual(df.index[-1], updated.index[-1])
+
+    def test_stored_history_is_served_when_the_refresh_fails(self):
+        self.publish("AAPL", bars(30))
+        self.store.read("AAPL")
+        self.age("AAPL")
+        self.source.fetch.side_effect = ConnectionError("upstream down")
+
+        with self.assertLogs("ml_model.store", "WARNING"):
+            df = self.store.read("AAPL")
+
+        self.assertEqual(len(df), 30)
+
+    def test_failed_first_fetch_raises(self):
+        self.source.fetch.side_effect = ConnectionError("upstream down")
+
+        with self.assertRaises(ConnectionError):
+            self.store.read("AAPL")
+
+    def test_refresh_many_requests_missing_and_stale_tickers_together(self):
+        for ticker, days in (("AAPL", 30), ("MSFT", 20), ("GOOG", 10)):
+            self.publish(ticker, bars(days)[:-3])
+            self.store.read(ticker)
+        self.age("AAPL")
+        self.age("MSFT")
+        self.publish("AMZN", bars(5))
+        for ticker, days in (("AAPL", 30), ("MSFT", 20)):
+            self.publish(ticker, bars(days))
+        self.source.reset_mock()
+
+        refreshed = self.store.refresh_many(["AAPL", "MSFT", "GOOG", "AMZN"])
+
+        self.assertEqual(refreshed, 3)
+        self.assertEqual(self.source.fetch_many.call_args_list, [
+            mock.call(["AMZN"]),
+            mock.call(["AAPL", "MSFT"], start=bars(30).index[-4]),
+        ])
+        self.assertEqual([len(self.store.read(t)) for t in ("AAPL", "MSFT", "GOOG", "AMZN")], [30, 20, 7, 5])
+
+    def test_invalid_tickers_are_rejected(self):
+        for ticker in ("../etc/passwd", "A" * 21, "AA PL", ".AAPL", ""):
+            with self.subTest(ticker=ticker), self.assertRaises(ValueError):
+                self.store.read(ticker)
+        self.source.fetch.assert_not_called()
+
+
+def window_mean_model(version="v1"):
+    """A stand-in for run_inference: predicts the mean of each scaled window."""
+    loaded = SimpleNamespace(version=version)
+    return mock.Mock(side_effect=lambda x: (x.mean(axis=1), loaded))
+
+
+def random_walk(days, seed=0):
+    df = bars(days)
+    df["Close"] = 100 + np.random.default_rng(seed).normal(0, 1, days).cumsum()
+    return df
+
+
+class InferenceStateTests(SimpleTestCase):
+    window = 10
+
+    def score(self, df, start, lo, rng, predict):
+        """Score every bar of `df` from `start` on, as a full run would."""
+        close = df["Close"].to_numpy()
+        x = np.stack([(close[p - self.window:p] - lo) / rng for p in range(start, len(df))])[..., np.newaxis]
+        y_pred, loaded = predict(x.astype(np.float32))
+        return InferenceState(loaded.version, lo, rng, bar_days(df)[start:], close[start:], y_pred.reshape(-1) * rng + lo)
+
+    def test_advancing_matches_scoring_the_whole_series(self):
+        full = random_walk(80)
+        # The last stored bar was partial; its close has changed since
+        stored = full[:60].copy()
+        stored.iloc[-1, stored.columns.get_loc("Close")] += 3
+        predict = window_mean_model()
+        state = self.score(stored, 30, lo=90.0, rng=20.0, predict=predict)
+
+        self.assertTrue(state.advance(full, predict, window=self.window))
+
+        # Only the re-scored last bar and the 20 new ones went through the model
+        self.assertEqual(len(predict.call_args_list[-1].args[0]), 21)
+        expected = self.score(full, 30, lo=90.0, rng=20.0, predict=predict)
+        np.testing.assert_array_equal(state.days, expected.days)
+        np.testing.assert_allclose(state.y_pred, expected.y_pred, rtol=1e-6)
+        metrics = state.metrics()
+        err = expected.y_test - expected.y_pred
+        sst = ((expected.y_test - expected.y_test.mean()) ** 2).sum()
+        np.testing.assert_allclose(
+            [metrics["mse"], metrics["rmse"], metrics["r2"]],
+            [np.mean(err ** 2), np.sqrt(np.mean(err ** 2)), 1 - (err @ err) / sst],
+            rtol=1e-6,
+        )
+
+    def test_misaligned_days_are_not_advanced(self):
+        full = random_walk(80)
+        state = self.score(full[:60], 30, lo=90.0, rng=20.0, predict=window_mean_model())
+        before = state.metrics()
+
+        for df in (
+            full.drop(full.index[59]),  # the last scored day is gone from the history
+            full[:55],  # the history ends before it
+            full[55:],  # too few bars before it for a window
+        ):
+            with self.subTest(bars=len(df)):
+                self.assertFalse(state.advance(df, window_mean_model(), window=self.window))
+        self.assertEqual(state.metrics(), before)
+
+    def test_changed_model_version_is_not_advanced(self):
+        full = random_walk(80)
+        state = self.score(full[:60], 30, lo=90.0, rng=20.0, predict=window_mean_model("v1"))
+
+        self.assertFalse(state.advance(full, window_mean_model("v2"), window=self.window))
+        self.assertEqual(len(state.days), 30)
+
+
+class IncrementalPredictTests(SimpleTestCase):
+    """predict_with_plot falls back to scoring the whole test segment when the state can't be advanced."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.states = StateStore(os.path.join(directory.name, "state"))
+        for name, value in (
+            ("states", self.states),
+            ("MEDIA_DIR", os.path.join(directory.name, "media")),
+            ("INCREMENTAL_INFERENCE", True),
+        ):
+            patcher = mock.patch.object(predict_utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def predict(self, df, version="v1"):
+        model = window_mean_model(version)
+        with mock.patch.object(predict_utils, "run_inference", model), \
+                mock.patch.object(predict_utils, "registry", SimpleNamespace(version=version)):
+            result = predict_utils.predict_with_plot(df, "AAPL", plots=False)
+        return result, [len(call.args[0]) for call in model.call_args_list]
+
+    def test_new_bars_only_are_scored(self):
+        full = random_walk(500)
+        self.predict(full[:-5])
+
+        result, calls = self.predict(full)
+
+        self.assertEqual(calls, [6])
+        self.assertEqual(result["metrics"]["model_version"], "v1")
+
+    def test_whole_segment_is_rescored_when_the_model_changes(self):
+        full = random_walk(500)
+        self.predict(full[:-5])
+
+        result, calls = self.predict(full, version="v2")
+
+        # The whole test segment, the last 30% of the bars
+        self.assertEqual(calls, [len(full) - int(len(full) * 0.7)])
+        self.assertEqual(result["metrics"]["model_version"], "v2")
+
+    def test_whole_segment_is_rescored_when_the_history_changed(self):
+        full = random_walk(500)
+        self.predict(full[:-5])
+
+        # Upstream history was rebuilt and no longer contains the last scored day
+        rebuilt = full.drop(full.index[-6])
+        result, calls = self.predict(rebuilt)
+
+        self.assertEqual(calls, [len(rebuilt) - int(len(rebuilt) * 0.7)])
+        self.assertEqual(self.states.load("AAPL").days[-1], bar_days(rebuilt)[-1])
@@ -0,0 +1,17 @@
+"""
+Ticker symbol validation, kept free of heavy imports so the web process can
+check a request before queueing it.
+"""
+import re
+
+# Longest symbol accepted; the ticker columns of the api models hold this many characters
+TICKER_MAX_LENGTH = 20
+TICKER_RE = re.compile(rf"^[A-Z0-9^=_-][A-Z0-9.^=_-]{{0,{TICKER_MAX_LENGTH - 1}}}$")
+
+
+def clean_ticker(value):
+    """`value` stripped and uppercased, or None if it isn't a valid ticker symbol."""
+    if not isinstance(value, str):
+        return None
+    ticker = value.strip().upper()
+    return ticker if TICKER_RE.match(ticker) else None
@@ -0,0 +1,218 @@
+"""
+Stage timers for the prediction path, kept as histograms and exposed in the
+Prometheus text format.
+
+Every process (gunicorn workers, prediction workers, the bot) keeps its own
+histograms and a background thread writes them to METRICS_DIR every few
+seconds. /metrics merges the files of all processes on the host, so stages
+that run in the prediction worker show up next to those of the web process.
+Files of processes that have exited are deleted when merging, so the merged
+counters drop when a worker is recycled; Prometheus reads that as a counter
+reset, which rate() and increase() already handle.
+
+Timings taken in the current request or task are also collected for the
+Server-Timing header and the bot's log lines; see `collect()`.
+"""
+import atexit
+import contextvars
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from decouple import config
+
+METRICS_DIR = config('METRICS_DIR', default='data/metrics/')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+# A file not rewritten for this many flush intervals belongs to a process that is gone
+STALE_FLUSHES = 12
+
+METRIC_NAME = 'stock_insight_stage_seconds'
+# Upper bounds in seconds, from a quota check to a cold model load
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Timings of the current request or task, when someone is collecting them
+_collected = contextvars.ContextVar('stage_timings', default=None)
+
+
+class StageHistograms:
+    """Per-process histograms of stage durations, flushed to a file in the background."""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._stages = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flusher = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked child starts empty, with its own file and flush thread
+        self._stages = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            # Bucket counts are per bucket here and made cumulative when rendered
+            stats = self._stages.setdefault(stage, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            stats['buckets'][bisect_left(BUCKETS, seconds)] += 1
+            stats['sum'] += seconds
+            stats['count'] += 1
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{socket.gethostname()}-{os.getpid()}.json")
+
+    def flush(self):
+        """Write this process's histograms for /metrics to merge."""
+        with self._lock:
+            if not self._dirty:
+                # Nothing new; touch the file so it isn't taken for a dead process's
+                try:
+                    os.utime(self.path)
+                except OSError:
+                    pass
+                return
+            data = json.dumps(self._stages)
+            self._dirty = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            # Metrics must never break a request; try again on the next flush
+            self._dirty = True
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+histograms = StageHistograms()
+
+
+def observe(stage, seconds):
+    histograms.observe(stage, seconds)
+    timings = _collected.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timer(stage):
+    """Time the enclosed block, or the decorated function, as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect():
+    """
+    Also record the timings taken inside the block, in this context, into the
+    yielded list of `(stage, seconds)`. Work handed to other threads is only
+    included if they run in a copy of this context (see PlotRenderer).
+    """
+    timings = []
+    token = _collected.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected.reset(token)
+
+
+def stage_totals(timings):
+    """Collected `(stage, seconds)` pairs summed per stage, in order of first appearance."""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return totals
+
+
+def format_timings(timings):
+    """`stage 12.3ms, ...`, for log lines."""
+    return ', '.join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in stage_totals(timings).items())
+
+
+def is_dead(path, stale_after=STALE_FLUSHES * METRICS_FLUSH_INTERVAL):
+    """
+    Whether the process that wrote the histograms file `path` has exited. Its
+    pid is checked directly when it ran on this host; files from other hosts
+    (containers sharing METRICS_DIR) are dead once they stop being refreshed.
+    """
+    host, _, pid = os.path.basename(path)[:-len('.json')].rpartition('-')
+    if host == socket.gethostname() and pid.isdigit():
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+    try:
+        return time.time() - os.path.getmtime(path) > stale_after
+    except OSError:
+        return True
+
+
+def merged_stages(directory=METRICS_DIR):
+    """Sum the histograms flushed by every live process, including this one, and delete the rest."""
+    histograms.flush()
+    merged = {}
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if is_dead(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                stages = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for stage, stats in stages.items():
+            total = merged.setdefault(stage, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+            total['sum'] += stats['sum']
+            total['count'] += stats['count']
+    return merged
+
+
+def render_prometheus(stages):
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent in each stage of serving a prediction.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for stage in sorted(stages):
+        stats = stages[stage]
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), stats['buckets']):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {stats["sum"]}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {stats["count"]}')
+    return '\n'.join(lines) + '\n'